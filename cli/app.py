@@ -0,0 +1,982 @@
+"""
+Interactive Desktop Agent session: conversation loop, streaming output and commands.
+
+Imported by cli.main only once the CLI actually runs, so `--help` doesn't
+load the UI stack and the core managers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import inspect
+import re
+import sys
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import httpx
+from rich.console import Console, Group
+from rich.panel import Panel
+from rich.text import Text
+from rich.markdown import Markdown
+from rich.live import Live
+
+from core.config import ConfigManager
+from core.llm.manager import LLMManager
+from core.llm.base import LLMMessage
+from core.llm.continuation import ContinuationManager
+from core.mcp import MCPIntegration
+from core.tool_executor import ToolExecutor
+from core.code_executor import CodeExecutor
+from core.mcp.manager import MCPServerManager
+
+
+# Upper bound on retained conversation messages; only the last max_history are sent anyway
+_HISTORY_HARD_CAP = 4096
+
+# Seconds an LLM health check result is reused by /status
+_HEALTH_TTL = 5.0
+
+# Streamed text is pushed to the live panel only after this many new characters or seconds
+_RENDER_MIN_CHARS = 64
+_RENDER_INTERVAL = 0.08
+
+# Redundant "Code Execution Output" sections echoed back in continuations
+# (fenced block, plain "label:\noutput" line, or leftover bold label), matched in one pass
+_RE_CODE_EXEC_COMBINED = re.compile(
+    r'(?:\*\*Code Execution Output:\*\*\s*\n```[^`]*?```\s*\n?)'
+    r'|(?:Code Execution Output:\s*\n[^\n]*\n?)'
+    r'|(?:\*\*Code Execution Output:\*\*[^\n]*\n?)'
+)
+
+# Fallback pattern for the last executed code block when it isn't in canonical form
+_CODE_RE = re.compile(r'<code>\s*```python\s*(.*?)\s*```\s*</code>', re.DOTALL)
+
+HELP_TEXT = """
+**Available Commands:**
+- `/help` - Show this help message
+- `/quit` or `/exit` - Exit the application
+- `/clear` - Clear conversation history
+- `/status` - Show system status
+- `/reload` - Reload configuration
+- `/mcp` - Show MCP status and management
+- `/tools` - List available MCP tools
+- `/approvals` - Show pending approval requests
+- `/stream` - Toggle streaming mode on/off
+- Any other input will be sent to the AI agent
+
+**Tips:**
+- Use natural language to interact with the agent
+- The agent can help with code execution, web search, file operations, and more
+- MCP servers provide extended functionality through tools and resources
+- Type your questions or requests and press Enter
+- Streaming mode provides real-time response updates
+"""
+
+
+def _find_last_tagged(content: str, open_tag: str, close_tag: str) -> Optional[str]:
+    """Return the stripped text inside the last open_tag...close_tag pair, if any."""
+    end = content.rfind(close_tag)
+    if end == -1:
+        return None
+    start = content.rfind(open_tag, 0, end)
+    if start == -1:
+        return None
+    return content[start + len(open_tag):end].strip()
+
+
+def _find_last_code_and_output(content: str) -> Optional[Tuple[str, str]]:
+    """Find the last executed python code block and the last code output."""
+    last_output = _find_last_tagged(content, '<code_output>', '</code_output>')
+    if last_output is None:
+        return None
+    
+    last_code = _find_last_tagged(content, '<code>', '</code>')
+    if last_code and last_code.startswith('```python') and last_code.endswith('```') and len(last_code) >= 12:
+        last_code = last_code[9:-3].strip()
+    else:
+        code_matches = list(_CODE_RE.finditer(content))
+        if not code_matches:
+            return None
+        last_code = code_matches[-1].group(1).strip()
+    
+    return last_code, last_output
+
+
+def _next_code_scan_offset(content: str, scan_offset: int, executed: bool) -> int:
+    """
+    Offset from which streamed content must be rescanned for code blocks.
+    
+    Content after the last inserted output, or a block opened but not yet
+    closed (one chunk may close a block and open the next), is kept in range.
+    """
+    if executed:
+        scan_offset = content.rfind('</code_output>') + len('</code_output>')
+    open_start = content.rfind('<code>', scan_offset)
+    if open_start != -1 and content.find('</code>', open_start) == -1:
+        return open_start
+    # Keep room for a <code> tag split across chunks
+    return max(scan_offset, len(content) - len('<code>') + 1)
+
+
+class DesktopAgentCLI:
+    """Main CLI application for Desktop Agent."""
+    
+    # Slash command -> name of the (sync or async) method handling it
+    _COMMANDS = {
+        '/quit': '_cmd_quit',
+        '/exit': '_cmd_quit',
+        '/help': 'display_help',
+        '/clear': '_cmd_clear',
+        '/status': 'display_status',
+        '/reload': '_cmd_reload',
+        '/mcp': 'display_mcp_status',
+        '/tools': 'display_mcp_tools',
+        '/approvals': 'display_pending_approvals',
+        '/stream': '_cmd_toggle_stream',
+    }
+    
+    def __init__(self, debug: bool = False):
+        self.console = Console()
+        self.debug = debug
+        self.config_manager = ConfigManager()
+        self.llm_manager = LLMManager()
+        self.continuation_manager = None  # Will be initialized after LLM manager
+        self.mcp_integration = MCPIntegration()
+        self.mcp_manager = MCPServerManager()
+        self.tool_executor = ToolExecutor(self.mcp_manager)
+        self.code_executor = None  # Will be initialized after config is loaded
+        self.conversation_history = deque(maxlen=_HISTORY_HARD_CAP)
+        self.running = False
+        self.streaming_enabled = True  # Enable streaming by default
+        self._cli_cfg = {}  # CLI config snapshot, refreshed on initialize/reload
+        self._max_history = 20
+        self._prompt_text = "Desktop Agent> "
+        self._messages_tail = deque(maxlen=self._max_history)  # Tail of history sent to the LLM
+        self._sys_prompt_cache: Optional[Tuple[str, str, LLMMessage]] = None  # (minute, workspace, message)
+        self._http_transport: Optional[httpx.AsyncHTTPTransport] = None  # Shared LLM connection pool
+        self._help_panel: Optional[Panel] = None  # Built on first /help
+        self._health_cache: Optional[Tuple[float, bool]] = None  # (checked_at, healthy)
+        self._welcome_subtitle = ""
+    
+    async def initialize(self) -> bool:
+        """Initialize the CLI application."""
+        try:
+            # Validate configurations
+            if not self.config_manager.validate_configs():
+                self.console.print("[red]Configuration validation failed![/red]")
+                return False
+            
+            # Share one keep-alive connection pool across LLM engine instances
+            self._http_transport = httpx.AsyncHTTPTransport(
+                limits=httpx.Limits(max_keepalive_connections=16, max_connections=32)
+            )
+            self.llm_manager.attach_transport(self._http_transport)
+            
+            # LLM and MCP startup are independent, so run them concurrently
+            llm_result, mcp_result, mcp_servers_result = await asyncio.gather(
+                self.llm_manager.initialize(),
+                self.mcp_integration.initialize(),
+                self.mcp_manager.initialize(),
+                return_exceptions=True
+            )
+            if isinstance(llm_result, BaseException):
+                raise llm_result
+            
+            # Initialize continuation manager
+            self.continuation_manager = ContinuationManager(self.llm_manager)
+            
+            # Test LLM connection
+            if not await self._cached_health():
+                self.console.print("[red]LLM health check failed![/red]")
+                await self._release_startup_resources()
+                return False
+            
+            # Report MCP integration
+            if mcp_result is True:
+                self.console.print("[green]MCP integration initialized successfully.[/green]")
+            elif isinstance(mcp_result, BaseException):
+                self.console.print(f"[yellow]MCP integration failed to initialize: {mcp_result} (continuing without MCP).[/yellow]")
+            else:
+                self.console.print("[yellow]MCP integration failed to initialize (continuing without MCP).[/yellow]")
+            
+            # Start MCP servers once the server manager is ready
+            if mcp_servers_result is True:
+                self.console.print("[green]MCP servers initialized successfully.[/green]")
+                await self.mcp_manager.start_all_servers()
+            elif isinstance(mcp_servers_result, BaseException):
+                self.console.print(f"[yellow]MCP server manager failed to initialize: {mcp_servers_result} (continuing without MCP servers).[/yellow]")
+            else:
+                self.console.print("[yellow]MCP server manager failed to initialize (continuing without MCP servers).[/yellow]")
+            
+            # Cache CLI settings used on every turn and the welcome subtitle
+            self._load_cli_settings()
+            self._update_welcome_subtitle()
+            
+            # Initialize Code Executor with sandbox configuration
+            sandbox_config = self.config_manager.get_sandbox_config()
+            self.code_executor = CodeExecutor(sandbox_config)
+            await self.code_executor.warm_up()
+            self.console.print("[green]Code executor initialized successfully.[/green]")
+            
+            return True
+            
+        except Exception as e:
+            self.console.print(f"[red]Initialization failed: {e}[/red]")
+            await self._release_startup_resources()
+            return False
+    
+    async def _release_startup_resources(self):
+        """Stop whatever a failed initialize() already started (MCP servers, workers, connections)."""
+        # MCP may already have started servers; don't leave them running
+        results = await asyncio.gather(
+            self.mcp_integration.shutdown(),
+            self.mcp_manager.shutdown(),
+            return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, Exception) and self.debug:
+                self.console.print(f"[dim]MCP shutdown error: {result}[/dim]")
+        
+        if self.code_executor:
+            await self.code_executor.close()
+            self.code_executor = None
+        await self.llm_manager.close_engine()
+        if self._http_transport:
+            await self._http_transport.aclose()
+            self._http_transport = None
+    
+    def _load_cli_settings(self):
+        """Cache CLI settings read on the per-turn path."""
+        self._cli_cfg = self.config_manager.get_cli_config()
+        self._max_history = self._cli_cfg.get("max_history", 20)
+        self._prompt_text = self._cli_cfg.get("prompt", "Desktop Agent> ")
+        self._messages_tail = deque(self.conversation_history, maxlen=self._max_history)
+    
+    async def _cached_health(self) -> bool:
+        """Return the LLM health, reusing a result younger than _HEALTH_TTL seconds."""
+        now = time.monotonic()
+        if self._health_cache is not None and now - self._health_cache[0] < _HEALTH_TTL:
+            return self._health_cache[1]
+        
+        healthy = await self.llm_manager.health_check()
+        self._health_cache = (time.monotonic(), healthy)
+        return healthy
+    
+    def _update_welcome_subtitle(self):
+        """Cache the provider/model subtitle shown in the welcome panel."""
+        provider_info = self.llm_manager.get_provider_info()
+        self._welcome_subtitle = (
+            f"Provider: {provider_info.get('provider', 'unknown')} | "
+            f"Model: {provider_info.get('model', 'unknown')}"
+        )
+    
+    def _add_to_history(self, message: LLMMessage):
+        """Record a message in the conversation history."""
+        self.conversation_history.append(message)
+        self._messages_tail.append(message)
+    
+    def _extend_history(self, messages: List[LLMMessage]):
+        """Record several messages in the conversation history."""
+        self.conversation_history.extend(messages)
+        self._messages_tail.extend(messages)
+    
+    @staticmethod
+    def _tool_result_messages(tool_results) -> List[LLMMessage]:
+        """Build tool role messages for executed tool results."""
+        return [
+            LLMMessage(
+                role="tool",
+                content=tool_result.content if tool_result.success else f"Error: {tool_result.error}",
+                name=tool_result.name
+            )
+            for tool_result in tool_results
+        ]
+    
+    def display_welcome(self):
+        """Display welcome message."""
+        welcome_text = self.config_manager.get_user_greeting()
+        
+        welcome_panel = Panel(
+            welcome_text,
+            title="🤖 Desktop Agent",
+            subtitle=self._welcome_subtitle,
+            border_style="blue"
+        )
+        
+        self.console.print(welcome_panel)
+        self.console.print()
+    
+    def display_help(self):
+        """Display help information."""
+        if self._help_panel is None:
+            self._help_panel = Panel(Markdown(HELP_TEXT), title="📖 Help", border_style="green")
+        self.console.print(self._help_panel)
+    
+    async def display_status(self):
+        """Display system status."""
+        # Get LLM status
+        llm_healthy = await self._cached_health()
+        provider_info = self.llm_manager.get_provider_info()
+        
+        # Get MCP status
+        mcp_status = self.mcp_integration.get_status()
+        
+        status_text = f"""
+**LLM Status:** {'🟢 Healthy' if llm_healthy else '🔴 Unhealthy'}
+**Provider:** {provider_info.get('provider', 'Unknown')}
+**Model:** {provider_info.get('model', 'Unknown')}
+**Endpoint:** {provider_info.get('endpoint', 'Unknown')}
+**Streaming Mode:** {'🟢 Enabled' if self.streaming_enabled else '🔴 Disabled'}
+**Conversation Messages:** {len(self.conversation_history)}
+**Available Providers:** {', '.join(self.llm_manager.list_available_providers())}
+
+**MCP Status:** {'🟢 Initialized' if mcp_status.get('status') == 'initialized' else '🔴 Not Initialized'}
+**MCP Tools:** {mcp_status.get('tools', 0)}
+**MCP Resources:** {mcp_status.get('resources', 0)}
+**MCP Servers:** {len(mcp_status.get('servers', {}))} configured
+        """
+        
+        status_panel = Panel(
+            Markdown(status_text),
+            title="📊 System Status",
+            border_style="yellow"
+        )
+        
+        self.console.print(status_panel)
+    
+    async def handle_user_input(self, user_input: str, use_streaming: bool = True):
+        """Handle user input and generate response."""
+        # Add user message to history
+        user_message = LLMMessage(role="user", content=user_input)
+        self._add_to_history(user_message)
+        
+        # Reuse the system message while the minute and workspace are unchanged
+        now = datetime.now()
+        minute_key = now.strftime("%Y-%m-%d %H:%M")
+        workspace_path = str(Path.cwd())
+        
+        cache = self._sys_prompt_cache
+        if cache is not None and cache[0] == minute_key and cache[1] == workspace_path:
+            system_message = cache[2]
+        else:
+            system_prompt = self.config_manager.get_system_prompt(
+                current_datetime=now.strftime("%Y-%m-%d %H:%M:%S"),
+                workspace_path=workspace_path
+            )
+            system_message = LLMMessage(role="system", content=system_prompt)
+            self._sys_prompt_cache = (minute_key, workspace_path, system_message)
+        
+        # Prepare messages for LLM (system message + last N history messages)
+        messages = [system_message, *self._messages_tail]
+        
+        if use_streaming:
+            await self._handle_streaming_response(messages)
+        else:
+            await self._handle_non_streaming_response(messages)
+    
+    async def _handle_streaming_response(self, messages):
+        """Handle streaming response generation with tool execution loop."""
+        max_tool_iterations = 5  # Prevent infinite loops
+        iteration = 0
+        
+        while iteration < max_tool_iterations:
+            # Generate streaming response
+            status_text = "[bold green]Thinking..." if iteration == 0 else f"[bold green]Processing tools (iteration {iteration})..."
+            
+            try:
+                # Show initial status
+                self.console.print(f"\n{status_text}")
+                
+                # Create an append-only renderable for streaming output; Live only redraws when
+                # the streamed Text is refreshed explicitly, and Markdown is rendered once at the end
+                parts: List[str] = []  # Source of truth while streaming; joined only when needed
+                rendered_parts = 0  # parts[:rendered_parts] are already in the streamed text
+                pending_chars = 0  # Characters received since the last render
+                last_render_ts = time.monotonic()
+                scan_offset = 0  # Content before this offset has already been checked for code
+                tail = ""  # Last few characters, to catch a closing tag split across chunks
+                streamed_text = Text()
+                response_panel = Panel(
+                    streamed_text,
+                    title="🤖 Desktop Agent",
+                    border_style="blue"
+                )
+                response_group = Group(response_panel)
+                
+                # Bind hot-loop lookups once
+                append_part = parts.append
+                append_text = streamed_text.append
+                code_executor = self.code_executor
+                
+                # Stream the response
+                final_usage = None
+                with Live(response_group, console=self.console, auto_refresh=False) as live:
+                    refresh = live.refresh
+                    render_timer = None  # Renders buffered text if no further chunk arrives in time
+                    
+                    def render_pending():
+                        nonlocal rendered_parts, pending_chars, last_render_ts, render_timer
+                        if render_timer is not None:
+                            render_timer.cancel()
+                            render_timer = None
+                        if pending_chars and live.is_started:
+                            append_text("".join(parts[rendered_parts:]))
+                            refresh()
+                            rendered_parts = len(parts)
+                            pending_chars = 0
+                            last_render_ts = time.monotonic()
+                    
+                    async for chunk in self.llm_manager.generate_stream(messages):
+                        content = chunk.content
+                        if content:
+                            append_part(content)
+                            pending_chars += len(content)
+                            
+                            # Check for completed code blocks in the unchecked tail and execute them
+                            if code_executor and "</code>" in tail + content:
+                                accumulated_content, executed = await code_executor.extract_and_execute_completed_code_async(
+                                    "".join(parts), scan_offset
+                                )
+                                parts[:] = [accumulated_content]
+                                streamed_text.plain = accumulated_content
+                                refresh()
+                                rendered_parts = 1
+                                pending_chars = 0
+                                last_render_ts = time.monotonic()
+                                scan_offset = _next_code_scan_offset(accumulated_content, scan_offset, executed)
+                                tail = accumulated_content[-6:]
+                            else:
+                                tail = (tail + content)[-6:]
+                            
+                            # Coalesce small chunks into one update of the streamed text
+                            if pending_chars:
+                                wait = _RENDER_INTERVAL - (time.monotonic() - last_render_ts)
+                                if pending_chars >= _RENDER_MIN_CHARS or wait <= 0:
+                                    render_pending()
+                                elif render_timer is None:
+                                    render_timer = asyncio.get_running_loop().call_later(wait, render_pending)
+                        
+                        # Check if this is the final chunk
+                        if chunk.finished:
+                            final_usage = chunk.usage
+                            break
+                    
+                    if render_timer is not None:
+                        render_timer.cancel()
+                    accumulated_content = "".join(parts)
+                    
+                    # Replace the streamed plain text with the rendered Markdown, reusing the panel
+                    if accumulated_content:
+                        response_panel.renderable = Markdown(accumulated_content)
+                        live.update(response_group, refresh=True)
+                    
+                    # Display usage info if available
+                    if final_usage:
+                        live.stop()
+                        self._display_usage_info(final_usage)
+                
+                # Check for code execution continuation after streaming ends
+                if self.code_executor and "</code_output>" in accumulated_content:
+                    # Check if we should continue generation after code execution
+                    continuation_result = await self._handle_code_continuation(messages, accumulated_content)
+                    if continuation_result:
+                        accumulated_content = continuation_result
+                
+                # Process only tool calls (not code execution, as that's handled during streaming)
+                tool_uses = self.tool_executor.find_tool_uses(accumulated_content)
+                if tool_uses:
+                    # Execute tools and get results
+                    tool_results, cleaned_content = await self.tool_executor.execute_tools_in_text(accumulated_content, tool_uses)
+                    
+                    # Add assistant message with cleaned content (without tool_use tags)
+                    if cleaned_content.strip():
+                        assistant_message = LLMMessage(role="assistant", content=cleaned_content)
+                        self._add_to_history(assistant_message)
+                        messages.append(assistant_message)
+                    
+                    # Add tool results to conversation history and messages
+                    function_messages = self._tool_result_messages(tool_results)
+                    self._extend_history(function_messages)
+                    messages.extend(function_messages)
+                    
+                    # Continue loop for next iteration
+                    iteration += 1
+                    continue
+                else:
+                    # No tool calls, this is the final response
+                    assistant_message = LLMMessage(role="assistant", content=accumulated_content)
+                    self._add_to_history(assistant_message)
+                    
+                    # Exit loop
+                    break
+            
+            except asyncio.CancelledError:
+                # Handle cancellation gracefully
+                self.console.print("\n[yellow]Streaming cancelled by user.[/yellow]")
+                break
+            except Exception as e:
+                error_panel = Panel(
+                    f"[red]Error generating streaming response: {str(e)}[/red]\n[dim]Use `/stream` to toggle to non-streaming mode if this persists.[/dim]",
+                    title="❌ Streaming Error",
+                    border_style="red"
+                )
+                self.console.print(error_panel)
+                
+                # Only format the full traceback in debug mode
+                if self.debug:
+                    import traceback
+                    error_details = traceback.format_exc()
+                else:
+                    error_details = f"{type(e).__name__}: {e}"
+                self.console.print(f"[dim]Debug info: {error_details[:300]}[/dim]")
+                
+                # Try to fallback to non-streaming for this response
+                try:
+                    self.console.print("[yellow]Attempting fallback to non-streaming mode...[/yellow]")
+                    await self._handle_non_streaming_response(messages)
+                    break
+                except Exception as fallback_error:
+                    self.console.print(f"[red]Fallback also failed: {fallback_error}[/red]")
+                    break
+        
+        # Check if we hit max iterations
+        if iteration >= max_tool_iterations:
+            warning_panel = Panel(
+                f"[yellow]Tool execution reached maximum iterations ({max_tool_iterations}). Stopping to prevent infinite loops.[/yellow]",
+                title="⚠️ Warning",
+                border_style="yellow"
+            )
+            self.console.print(warning_panel)
+    
+    async def _handle_non_streaming_response(self, messages):
+        """Handle non-streaming response generation (fallback mode)."""
+        max_tool_iterations = 5  # Prevent infinite loops
+        iteration = 0
+        
+        while iteration < max_tool_iterations:
+            # Generate response with loading indicator
+            status_text = "[bold green]Thinking..." if iteration == 0 else f"[bold green]Processing tools (iteration {iteration})..."
+            
+            with self.console.status(status_text, spinner="dots"):
+                try:
+                    response = await self.llm_manager.generate(messages)
+                    
+                    # Debug: Print what LLM generated
+                    if self.debug:
+                        self.console.print(f"[dim]DEBUG - Iteration {iteration}: LLM Response:[/dim]")
+                        self.console.print(f"[dim]{response.content[:200]}...[/dim]")
+                    
+                    # Process tools and code execution
+                    processed_content, has_executable_content = await self._process_executable_content(response.content, iteration)
+                    
+                    if has_executable_content:
+                        # Continue loop for next iteration
+                        messages.extend(processed_content)
+                        iteration += 1
+                        continue
+                    else:
+                        # No tool calls, this is the final response
+                        assistant_message = LLMMessage(role="assistant", content=response.content)
+                        self._add_to_history(assistant_message)
+                        
+                        # Display final response
+                        response_panel = Panel(
+                            Markdown(response.content),
+                            title="🤖 Desktop Agent",
+                            border_style="blue"
+                        )
+                        self.console.print(response_panel)
+                        
+                        # Display usage info if available
+                        if response.usage:
+                            self._display_usage_info(response.usage)
+                        
+                        # Exit loop
+                        break
+                
+                except Exception as e:
+                    error_panel = Panel(
+                        f"[red]Error generating response: {e}[/red]",
+                        title="❌ Error",
+                        border_style="red"
+                    )
+                    self.console.print(error_panel)
+                    break  # Exit loop on error
+        
+        # Check if we hit max iterations
+        if iteration >= max_tool_iterations:
+            warning_panel = Panel(
+                f"[yellow]Tool execution reached maximum iterations ({max_tool_iterations}). Stopping to prevent infinite loops.[/yellow]",
+                title="⚠️ Warning",
+                border_style="yellow"
+            )
+            self.console.print(warning_panel)
+    
+    async def _process_executable_content(self, content: str, iteration: int):
+        """
+        Process both tool calls and code blocks in the content.
+        
+        Returns:
+            Tuple of (processed_messages, has_executable_content)
+        """
+        processed_messages = []
+        has_executable_content = False
+        
+        # First, process code blocks (parsed once and handed to the executor)
+        code_blocks = self.code_executor.parse_code_blocks(content) if self.code_executor else []
+        if code_blocks:
+            if self.debug:
+                self.console.print(f"[dim]DEBUG - Found code blocks in iteration {iteration}[/dim]")
+            
+            # Execute code blocks and get results with modified content
+            code_results, content_after_code = await self.code_executor.execute_code_blocks_in_text(content, code_blocks)
+            content = content_after_code  # Update content with execution results
+            
+            # We consider code execution as executable content but don't add separate messages
+            # The results are already integrated into the content
+            has_executable_content = True
+        
+        # Then, process tool calls (found once and handed to the executor)
+        tool_uses = self.tool_executor.find_tool_uses(content)
+        if tool_uses:
+            if self.debug:
+                self.console.print(f"[dim]DEBUG - Found tool calls in iteration {iteration}[/dim]")
+            
+            # Execute tools and get results
+            tool_results, cleaned_content = await self.tool_executor.execute_tools_in_text(content, tool_uses)
+            
+            # Add assistant message with cleaned content (without tool_use tags)
+            if cleaned_content.strip():
+                assistant_message = LLMMessage(role="assistant", content=cleaned_content)
+                self._add_to_history(assistant_message)
+                processed_messages.append(assistant_message)
+            
+            # Add tool results to conversation history and messages
+            function_messages = self._tool_result_messages(tool_results)
+            self._extend_history(function_messages)
+            processed_messages.extend(function_messages)
+            
+            has_executable_content = True
+        elif has_executable_content:
+            # Only code blocks were executed, add the modified content as assistant message
+            assistant_message = LLMMessage(role="assistant", content=content)
+            self._add_to_history(assistant_message)
+            processed_messages.append(assistant_message)
+        
+        return processed_messages, has_executable_content
+    
+    def _display_usage_info(self, usage: dict):
+        """Display usage information."""
+        usage_text = Text()
+        usage_text.append("Usage: ", style="dim")
+        
+        if "total_tokens" in usage:
+            usage_text.append(f"Tokens: {usage['total_tokens']} ", style="dim cyan")
+        elif "eval_count" in usage:
+            usage_text.append(f"Tokens: {usage['eval_count']} ", style="dim cyan")
+        
+        if "total_duration" in usage:
+            duration_ms = usage["total_duration"] / 1_000_000  # Convert to ms
+            usage_text.append(f"Time: {duration_ms:.1f}ms", style="dim cyan")
+        
+        self.console.print(usage_text)
+    
+    async def run(self):
+        """Main CLI loop."""
+        # Initialize
+        if not await self.initialize():
+            return
+        
+        # Display welcome
+        self.display_welcome()
+        
+        self.running = True
+        
+        # Piped input skips prompt rendering entirely
+        if sys.stdin.isatty():
+            self._read_input = lambda: self.console.input(self._prompt_text).strip()
+        else:
+            self._read_input = self._read_piped_input
+        
+        while self.running:
+            try:
+                # Get user input
+                user_input = self._read_input()
+                
+                if not user_input:
+                    continue
+                
+                # Handle commands
+                if user_input.startswith('/'):
+                    await self.handle_command(user_input)
+                else:
+                    # Handle normal conversation
+                    await self.handle_user_input(user_input, use_streaming=self.streaming_enabled)
+                
+                self.console.print()  # Add spacing
+                
+            except KeyboardInterrupt:
+                self.console.print("\n[yellow]Use /quit to exit gracefully.[/yellow]")
+            except EOFError:
+                break
+        
+        # Cleanup
+        if self.code_executor:
+            await self.code_executor.close()
+        await self.llm_manager.close_engine()
+        if self._http_transport:
+            await self._http_transport.aclose()
+        await self.mcp_integration.shutdown()
+        self.console.print("[green]Goodbye! 👋[/green]")
+    
+    @staticmethod
+    def _read_piped_input() -> str:
+        """Read one line from non-interactive stdin."""
+        line = sys.stdin.readline()
+        if not line:
+            raise EOFError
+        return line.strip()
+    
+    async def handle_command(self, command: str):
+        """Handle CLI commands."""
+        command = command.strip()
+        name = self._COMMANDS.get(command) or self._COMMANDS.get(command.lower())
+        
+        if name is None:
+            self.console.print(f"[yellow]Unknown command: {command.lower()}[/yellow]")
+            self.console.print("[dim]Type /help for available commands.[/dim]")
+            return
+        
+        result = getattr(self, name)()
+        if inspect.isawaitable(result):
+            await result
+    
+    def _cmd_quit(self):
+        """Stop the main loop."""
+        self.running = False
+    
+    def _cmd_clear(self):
+        """Clear the conversation history."""
+        self.conversation_history.clear()
+        self._messages_tail.clear()
+        self.console.print("[green]Conversation history cleared.[/green]")
+    
+    async def _cmd_reload(self):
+        """Reload configuration files, the LLM engine and MCP configuration."""
+        try:
+            self.config_manager.reload_configs()
+            self._load_cli_settings()
+            self._sys_prompt_cache = None
+            await self.llm_manager.reload_config()
+            if self.continuation_manager:
+                self.continuation_manager.refresh()
+            self._health_cache = None
+            self._update_welcome_subtitle()
+            await self.mcp_integration.reload_configuration()
+            self.console.print("[green]Configuration reloaded successfully.[/green]")
+        except Exception as e:
+            self.console.print(f"[red]Failed to reload configuration: {e}[/red]")
+    
+    def _cmd_toggle_stream(self):
+        """Toggle streaming mode."""
+        self.streaming_enabled = not self.streaming_enabled
+        status = "enabled" if self.streaming_enabled else "disabled"
+        self.console.print(f"[green]Streaming mode {status}.[/green]")
+    
+    async def display_mcp_status(self):
+        """Display detailed MCP status."""
+        mcp_status = self.mcp_integration.get_status()
+        
+        if mcp_status.get('status') == 'not_initialized':
+            self.console.print("[red]MCP is not initialized.[/red]")
+            return
+        
+        # Server status
+        servers = mcp_status.get('servers', {})
+        servers_block = "\n".join(
+            f"- {'🟢' if info.get('status') == 'running' else '🔴'} **{server_name}**: {info.get('status', 'unknown')} ({info.get('tools', 0)} tools, {info.get('resources', 0)} resources)"
+            for server_name, info in servers.items()
+        )
+        
+        # Security status
+        security = mcp_status.get('security', {})
+        
+        status_text = f"""
+**MCP Status:** {'🟢 Active' if mcp_status.get('status') == 'initialized' else '🔴 Inactive'}
+**Total Tools:** {mcp_status.get('tools', 0)}
+**Total Resources:** {mcp_status.get('resources', 0)}
+
+**Servers:**
+{servers_block or "No servers configured"}
+
+**Security:**
+- **Pending Approvals:** {security.get('pending_approvals', 0)}
+- **Security Rules:** {security.get('rules_count', 0)}
+- **Blocked Entities:** {security.get('blocked_servers', 0)} servers, {security.get('blocked_tools', 0)} tools
+        """
+        
+        mcp_panel = Panel(
+            Markdown(status_text),
+            title="🔧 MCP Status",
+            border_style="cyan"
+        )
+        
+        self.console.print(mcp_panel)
+    
+    async def display_mcp_tools(self):
+        """Display available MCP tools."""
+        tools = self.mcp_integration.list_tools()
+        
+        if not tools:
+            self.console.print("[yellow]No MCP tools available.[/yellow]")
+            return
+        
+        tools_block = "\n".join(
+            f"- **{tool['name']}** (from {tool['server']}): {tool.get('description', 'No description')}"
+            for tool in tools
+        )
+        
+        tools_text = f"""
+**Available Tools ({len(tools)} total):**
+
+{tools_block}
+
+**Usage:** Include tool usage requests in your natural language input to the agent.
+        """
+        
+        tools_panel = Panel(
+            Markdown(tools_text),
+            title="🛠️ MCP Tools",
+            border_style="green"
+        )
+        
+        self.console.print(tools_panel)
+    
+    async def display_pending_approvals(self):
+        """Display pending approval requests."""
+        approvals = self.mcp_integration.get_pending_approvals()
+        
+        if not approvals:
+            self.console.print("[green]No pending approval requests.[/green]")
+            return
+        
+        approvals_block = "\n".join(
+            f"- **ID**: {approval['id'][:8]}... | **Operation**: {approval['operation_type']} | **Server**: {approval['server_name']} | **Tool**: {approval.get('tool_name', 'N/A')} | **Time**: {approval['timestamp']}"
+            for approval in approvals
+        )
+        
+        approvals_text = f"""
+**Pending Approvals ({len(approvals)} total):**
+
+{approvals_block}
+
+**Note:** Approvals are currently handled automatically based on security rules.
+Future versions will support manual approval workflows.
+        """
+        
+        approvals_panel = Panel(
+            Markdown(approvals_text),
+            title="⏳ Pending Approvals",
+            border_style="orange"
+        )
+        
+        self.console.print(approvals_panel)
+    
+    async def _handle_code_continuation(self, messages, content_with_code_output):
+        """
+        Handle continuation generation after code execution.
+        
+        Args:
+            messages: Current conversation messages
+            content_with_code_output: Assistant content including <code_output>
+            
+        Returns:
+            Extended content with continuation, or None if no continuation needed
+        """
+        try:
+            # Check if the content contains executed code before doing any parsing
+            if '</code>' not in content_with_code_output or '</code_output>' not in content_with_code_output:
+                return None
+            
+            # Check if continuation is supported
+            if not self.continuation_manager or not self.continuation_manager.supports_continuation():
+                return None
+            
+            # Find the last code block and its output
+            last_code_and_output = _find_last_code_and_output(content_with_code_output)
+            if last_code_and_output is None:
+                return None
+            last_code, last_output = last_code_and_output
+            
+            # Show subtle continuation status
+            self.console.print("[dim]...[/dim]", end="")
+            
+            # Generate continuation
+            continuation_response = await self.continuation_manager.continue_with_code_result(
+                conversation_messages=messages,
+                partial_assistant_response=content_with_code_output,
+                code=last_code,
+                code_output=last_output,
+                max_continuation_tokens=300,  # Limit continuation length
+                stream=False
+            )
+            
+            # Display the continuation
+            if continuation_response and continuation_response.content != content_with_code_output:
+                # Extract only the new content (after the original)
+                if continuation_response.content.startswith(content_with_code_output):
+                    new_content = continuation_response.content[len(content_with_code_output):]
+                    if new_content.strip():
+                        # Clean up the new content formatting
+                        cleaned_new_content = self._clean_continuation_content(new_content)
+                        
+                        if cleaned_new_content:
+                            # Display the continuation seamlessly (without showing it's a continuation)
+                            self.console.print(Markdown(cleaned_new_content))
+                            
+                            # Display usage info if available
+                            if continuation_response.usage:
+                                self._display_usage_info(continuation_response.usage)
+                        
+                        return continuation_response.content
+            
+            return None
+            
+        except Exception as e:
+            self.console.print(f"[yellow]Warning: Code continuation failed: {e}[/yellow]")
+            return None
+    
+    def _clean_continuation_content(self, content: str) -> str:
+        """
+        Clean up continuation content for better display.
+        
+        Args:
+            content: Raw continuation content
+            
+        Returns:
+            Cleaned content for display
+        """
+        # Remove leading/trailing whitespace
+        content = content.strip()
+        
+        # Remove redundant "Code Execution Output:" sections since we already showed the output
+        if "Code Execution Output" in content:
+            content = _RE_CODE_EXEC_COMBINED.sub('', content)
+        
+        # Remove excessive newlines (str.replace usually converges in one pass)
+        while "\n\n\n" in content:
+            content = content.replace("\n\n\n", "\n\n")
+        
+        # Clean up the start of the content
+        content = content.lstrip('\n')
+        
+        # If content starts with just a summary or answer, make it more natural
+        if content and not content.startswith(('**', '#', '-', '*')):
+            # Add a small separator for natural flow
+            content = '\n' + content
+        
+        return content.strip()
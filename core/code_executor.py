@@ -5,18 +5,42 @@ Parses <code></code> tags and executes Python code.
 
 import re
 import asyncio
-import tempfile
+import json
 import os
-from typing import List, Tuple
+import signal
+import sys
+import textwrap
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple
 from dataclasses import dataclass
 
 
+# Matches <code></code> blocks. ASCII text is already stored one byte per char
+# (PEP 393), so a bytes twin of this pattern would only add an encode() pass.
+_CODE_PATTERN = re.compile(r'<code>(.*?)</code>', re.DOTALL | re.IGNORECASE)
+
+# Splits a fenced body into (language, code); the closing fence is optional
+_FENCE = re.compile(r'```([^\n]*)\n?(.*?)(?:\n[^\S\n]*```|(?<=\n)[^\S\n]*```)?\Z', re.DOTALL)
+
+_WORKER_SCRIPT = str(Path(__file__).with_name("code_worker.py"))
+_HEADER_SIZE = 4
+_POSIX = os.name == 'posix'
+# Workers fork a child per snippet where possible; otherwise a used worker is not reused
+_FORK = hasattr(os, 'fork')
+# Reader buffer for worker replies; the 64 KiB default pauses the pipe
+# repeatedly while a large printout is read back
+_READ_LIMIT = 4 * 1024 * 1024
+
+
 @dataclass
 class CodeBlock:
     """Represents a code block parsed from <code></code> tags."""
     language: str
     code: str
     raw_content: str
+    start: int  # Span of raw_content in the parsed text
+    end: int
 
 
 @dataclass
@@ -29,20 +53,131 @@ class CodeResult:
     execution_time: float = 0.0
 
 
+def _format_success(output: str, execution_time: float) -> str:
+    """Render a successful run as a <code_output> block."""
+    output = output.strip()
+    if output:
+        return f"<code_output>\n{output}\n</code_output>"
+    return f"<code_output>\n(出力なし - 実行時間: {execution_time:.3f}秒)\n</code_output>"
+
+
+def _format_error(error: str, output: str, execution_time: float) -> str:
+    """Render a failed run (error, captured stderr, timing) as a <code_output> block."""
+    output = output.strip()
+    details = f"\n{output}" if output else ""
+    return f"<code_output>\nエラー: {error}{details}\n実行時間: {execution_time:.3f}秒\n</code_output>"
+
+
+def _format_result(result: CodeResult) -> str:
+    """Render a CodeResult with the matching template."""
+    if result.success:
+        return _format_success(result.output, result.execution_time)
+    return _format_error(result.error, result.output, result.execution_time)
+
+
+class _WorkerPool:
+    """Pool of long-lived Python processes running core/code_worker.py."""
+    
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.subprocess.Process] = []
+    
+    async def _spawn(self) -> asyncio.subprocess.Process:
+        worker = await asyncio.create_subprocess_exec(
+            sys.executable, '-u', _WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+            start_new_session=_POSIX,  # Own process group, so kill() reaches snippet children
+            limit=_READ_LIMIT
+        )
+        self._workers.append(worker)
+        return worker
+    
+    async def warm_up(self) -> None:
+        """Fill the pool with idle workers."""
+        while self._idle.qsize() < self.size:
+            self._idle.put_nowait(await self._spawn())
+    
+    async def acquire(self) -> asyncio.subprocess.Process:
+        """Take an idle worker, spawning one if none is ready."""
+        while not self._idle.empty():
+            worker = self._idle.get_nowait()
+            if worker.returncode is None:
+                return worker
+            self._workers.remove(worker)
+        return await self._spawn()
+    
+    async def release(self, worker: asyncio.subprocess.Process) -> None:
+        """Return a worker to the pool, or stop it if the pool is full."""
+        if _FORK and worker.returncode is None and self._idle.qsize() < self.size:
+            self._idle.put_nowait(worker)
+        else:
+            await self.discard(worker)
+    
+    async def discard(self, worker: Optional[asyncio.subprocess.Process]) -> None:
+        """Kill a worker that can no longer be trusted (timeout, protocol error)."""
+        if worker is None:
+            return
+        self._kill(worker)
+        await worker.wait()
+        if worker in self._workers:
+            self._workers.remove(worker)
+    
+    @staticmethod
+    def _kill(worker: asyncio.subprocess.Process) -> None:
+        """SIGKILL the worker's process group, including anything the snippet started."""
+        if _POSIX:
+            try:
+                os.killpg(worker.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        elif worker.returncode is None:
+            worker.kill()
+    
+    async def run(self, worker: asyncio.subprocess.Process, code: str) -> Optional[dict]:
+        """Send one snippet and wait for its framed result (None if the worker died)."""
+        data = code.encode('utf-8')
+        worker.stdin.write(len(data).to_bytes(_HEADER_SIZE, 'big') + data)
+        await worker.stdin.drain()
+        
+        try:
+            header = await worker.stdout.readexactly(_HEADER_SIZE)
+            payload = await worker.stdout.readexactly(int.from_bytes(header, 'big'))
+        except asyncio.IncompleteReadError:
+            return None
+        return json.loads(payload)
+    
+    async def close(self) -> None:
+        """Stop every worker process."""
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for worker in list(self._workers):
+            if worker.returncode is None:
+                worker.stdin.close()
+                try:
+                    async with asyncio.timeout(1):
+                        await worker.wait()
+                except TimeoutError:
+                    self._kill(worker)
+                    await worker.wait()
+        self._workers.clear()
+
+
 class CodeExecutor:
     """Simple code executor for <code></code> blocks."""
     
+    __slots__ = ('_pool', '_sem', '_timeout')
+    
     def __init__(self, sandbox_config=None):
         """Initialize code executor."""
-        self.sandbox_config = sandbox_config or {}
-        
-        # Simple pattern to match <code></code> blocks
-        self.code_pattern = re.compile(
-            r'<code>(.*?)</code>', 
-            re.DOTALL | re.IGNORECASE
-        )
+        sandbox_config = sandbox_config or {}
+        self._pool = _WorkerPool(sandbox_config.get("workers", 2))
+        self._timeout = sandbox_config.get("timeout", 30)
+        self._sem = asyncio.Semaphore(os.cpu_count() or 4)  # Bounds concurrent snippets
     
-    def parse_code_blocks(self, text: str) -> List[CodeBlock]:
+    def parse_code_blocks(self, text: str, from_pos: int = 0) -> List[CodeBlock]:
         """
         Parse <code></code> tags from text and extract code blocks.
         
@@ -52,117 +187,97 @@ class CodeExecutor:
         print("Hello, World!")
         ```
         </code>
+        
+        Only blocks starting at or after from_pos are returned; spans are
+        still relative to the whole text.
         """
         code_blocks = []
         
-        for match in self.code_pattern.finditer(text):
+        for match in _CODE_PATTERN.finditer(text, from_pos):
             content = match.group(1).strip()
             raw_content = match.group(0)
             
             # Look for ```language markers
-            if content.startswith('```'):
-                lines = content.split('\n')
-                first_line = lines[0]
-                
-                # Extract language (if specified)
-                language = 'python'  # default
-                if len(first_line) > 3:
-                    lang_part = first_line[3:].strip()
-                    if lang_part:
-                        language = lang_part
-                
-                # Extract code (everything except first and last line)
-                if len(lines) >= 2 and lines[-1].strip() == '```':
-                    code_lines = lines[1:-1]
-                else:
-                    code_lines = lines[1:]
-                
-                code = '\n'.join(code_lines)
+            fence = _FENCE.match(content) if content.startswith('```') else None
+            if fence:
+                # Language from the opening line (default python), code without the fences
+                language = fence.group(1).strip().lower() or 'python'
+                code = fence.group(2)
             else:
                 # No ``` markers, treat as plain code
                 language = 'python'
                 code = content
             
             # Remove common indentation
-            if code.strip():
-                code = self._remove_common_indent(code)
-                
+            code = textwrap.dedent(code).strip()
+            if code:
                 code_blocks.append(CodeBlock(
-                    language=language.lower(),
+                    language=language,
                     code=code,
-                    raw_content=raw_content
+                    raw_content=raw_content,
+                    start=match.start(),
+                    end=match.end()
                 ))
         
         return code_blocks
     
-    def _remove_common_indent(self, code: str) -> str:
-        """Remove common leading whitespace from all lines."""
-        import textwrap
-        return textwrap.dedent(code).strip()
-    
     async def execute_python_code(self, code: str) -> CodeResult:
-        """Execute Python code using subprocess."""
-        import time
-        start_time = time.time()
+        """Execute Python code on a warm worker process."""
+        async with self._sem:
+            return await self._execute_python_code(code)
+    
+    async def _execute_python_code(self, code: str) -> CodeResult:
+        """Run one snippet on a pooled worker (caller holds the semaphore)."""
+        start_time = time.perf_counter()
         
+        worker = None
         try:
-            # Create temporary file
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-                f.write(code)
-                temp_file = f.name
+            worker = await self._pool.acquire()
             
-            try:
-                # Execute Python script
-                process = await asyncio.create_subprocess_exec(
-                    'python', temp_file,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE
+            async with asyncio.timeout(self._timeout):
+                result = await self._pool.run(worker, code)
+            
+            execution_time = time.perf_counter() - start_time
+            
+            if result is None:
+                # Worker died mid-snippet (e.g. os._exit); don't reuse it
+                returncode = await worker.wait()
+                await self._pool.discard(worker)
+                worker = None
+                result = {"stdout": "", "stderr": "", "returncode": returncode}
+            
+            # Handle results
+            if result["returncode"] == 0:
+                return CodeResult(
+                    code=code,
+                    output=result["stdout"],
+                    success=True,
+                    execution_time=execution_time
                 )
-                
-                stdout, stderr = await asyncio.wait_for(
-                    process.communicate(), 
-                    timeout=30
+            else:
+                return CodeResult(
+                    code=code,
+                    output=result["stderr"],
+                    success=False,
+                    error=f"Process exited with code {result['returncode']}",
+                    execution_time=execution_time
                 )
-                
-                execution_time = time.time() - start_time
-                
-                # Handle results
-                if process.returncode == 0:
-                    output = stdout.decode('utf-8', errors='replace')
-                    return CodeResult(
-                        code=code,
-                        output=output,
-                        success=True,
-                        execution_time=execution_time
-                    )
-                else:
-                    error_output = stderr.decode('utf-8', errors='replace')
-                    return CodeResult(
-                        code=code,
-                        output=error_output,
-                        success=False,
-                        error=f"Process exited with code {process.returncode}",
-                        execution_time=execution_time
-                    )
-            
-            finally:
-                # Clean up
-                try:
-                    os.unlink(temp_file)
-                except:
-                    pass
                     
-        except asyncio.TimeoutError:
-            execution_time = time.time() - start_time
+        except TimeoutError:
+            await self._pool.discard(worker)
+            worker = None
+            execution_time = time.perf_counter() - start_time
             return CodeResult(
                 code=code,
                 output="",
                 success=False,
-                error="Execution timeout (30 seconds)",
+                error=f"Execution timeout ({self._timeout} seconds)",
                 execution_time=execution_time
             )
         except Exception as e:
-            execution_time = time.time() - start_time
+            await self._pool.discard(worker)
+            worker = None
+            execution_time = time.perf_counter() - start_time
             return CodeResult(
                 code=code,
                 output="",
@@ -170,108 +285,138 @@ class CodeExecutor:
                 error=f"Execution error: {str(e)}",
                 execution_time=execution_time
             )
+        finally:
+            if worker is not None:
+                await self._pool.release(worker)
     
-    async def execute_code_blocks_in_text(self, text: str) -> Tuple[List[CodeResult], str]:
+    async def warm_up(self) -> None:
+        """Start the idle worker processes ahead of the first code block."""
+        await self._pool.warm_up()
+    
+    async def close(self) -> None:
+        """Stop all worker processes."""
+        await self._pool.close()
+    
+    async def execute_code_blocks_in_text(
+        self,
+        text: str,
+        code_blocks: Optional[List[CodeBlock]] = None
+    ) -> Tuple[List[CodeResult], str]:
         """
         Execute all code blocks found in text and return results with cleaned text.
         
+        Args:
+            text: Text containing <code></code> blocks
+            code_blocks: Optional result of parse_code_blocks(text) to avoid reparsing
+        
         Returns:
             Tuple of (code_results, cleaned_text)
         """
-        code_blocks = self.parse_code_blocks(text)
-        code_results = []
+        if code_blocks is None:
+            code_blocks = self.parse_code_blocks(text)
         
-        # Execute code blocks
-        for code_block in code_blocks:
-            if code_block.language == 'python':
-                result = await self.execute_python_code(code_block.code)
-                code_results.append(result)
-            else:
-                # Unsupported language
-                code_results.append(CodeResult(
-                    code=code_block.code,
-                    output="",
-                    success=False,
-                    error=f"Language '{code_block.language}' is not supported"
-                ))
+        # Execute code blocks concurrently (each runs in its own worker)
+        code_results = await asyncio.gather(*(self._execute_block(code_block) for code_block in code_blocks))
         
-        # Replace code blocks with results
-        cleaned_text = text
-        for i, code_block in enumerate(code_blocks):
-            result = code_results[i]
+        # Rebuild the text in one pass, inserting results after each block
+        parts = []
+        cursor = 0
+        for code_block, result in zip(code_blocks, code_results):
             
             # Format result using <code_output> tags
-            if result.success:
-                if result.output.strip():
-                    result_text = f"{code_block.raw_content}\n\n<code_output>\n{result.output.strip()}\n</code_output>"
-                else:
-                    result_text = f"{code_block.raw_content}\n\n<code_output>\n(出力なし - 実行時間: {result.execution_time:.3f}秒)\n</code_output>"
-            else:
-                error_info = f"エラー: {result.error}"
-                if result.output.strip():
-                    error_info += f"\n{result.output.strip()}"
-                error_info += f"\n実行時間: {result.execution_time:.3f}秒"
-                result_text = f"{code_block.raw_content}\n\n<code_output>\n{error_info}\n</code_output>"
+            result_text = f"{code_block.raw_content}\n\n{_format_result(result)}"
             
             # Replace code block with code + result
-            cleaned_text = cleaned_text.replace(code_block.raw_content, result_text, 1)
+            parts.append(text[cursor:code_block.start])
+            parts.append(result_text)
+            cursor = code_block.end
+        parts.append(text[cursor:])
         
-        return code_results, cleaned_text
+        return code_results, "".join(parts)
+    
+    async def _execute_block(self, code_block: CodeBlock) -> CodeResult:
+        """Execute one parsed block, rejecting unsupported languages."""
+        if code_block.language == 'python':
+            return await self.execute_python_code(code_block.code)
+        return CodeResult(
+            code=code_block.code,
+            output="",
+            success=False,
+            error=f"Language '{code_block.language}' is not supported"
+        )
     
     def has_code_blocks(self, text: str) -> bool:
         """Check if text contains code blocks."""
-        return bool(self.code_pattern.search(text))
+        if '<code>' not in text:
+            return False
+        return bool(_CODE_PATTERN.search(text))
     
     def has_complete_code_blocks(self, text: str) -> bool:
         """Check if text contains complete code blocks (with closing </code>)."""
-        return bool(self.code_pattern.search(text))
+        if '</code>' not in text:
+            return False
+        return self.find_next_complete_block(text) is not None
     
-    async def extract_and_execute_completed_code_async(self, text: str) -> Tuple[str, bool]:
+    def find_next_complete_block(self, text: str, from_pos: int = 0) -> Optional[Tuple[int, int]]:
+        """
+        Find the span of the first complete <code></code> block at or after from_pos.
+        
+        Uses plain substring search, so streaming callers can pass the offset
+        they have already scanned instead of re-running the regex over the
+        whole buffer on every chunk.
+        
+        Returns:
+            (start, end) of the block including its tags, or None
+        """
+        start = text.find('<code>', from_pos)
+        if start == -1:
+            return None
+        end = text.find('</code>', start + 6)
+        if end == -1:
+            return None
+        return start, end + 7
+    
+    async def extract_and_execute_completed_code_async(self, text: str, from_pos: int = 0) -> Tuple[str, bool]:
         """
         Async version: Extract and execute any completed code blocks in the text.
         Returns (modified_text, found_and_executed_code).
         
         This is designed for streaming scenarios where we want to execute
         code as soon as </code> is detected and append results inline.
+        Streaming callers pass the offset they have already processed as
+        from_pos, so earlier blocks are neither rescanned nor re-run.
         """
-        if not self.has_complete_code_blocks(text):
+        if '</code>' not in text or self.find_next_complete_block(text, from_pos) is None:
             return text, False
         
         # Find complete code blocks
-        code_blocks = self.parse_code_blocks(text)
+        code_blocks = self.parse_code_blocks(text, from_pos)
         if not code_blocks:
             return text, False
         
         try:
-            # Execute all code blocks
-            modified_text = text
+            # Execute all code blocks, rebuilding the text in one pass
+            parts = []
+            cursor = 0
             executed_any = False
             
-            for code_block in code_blocks:
-                if code_block.language == 'python':
-                    # Execute asynchronously
-                    result = await self.execute_python_code(code_block.code)
-                    
-                    # Format result using <code_output> tags
-                    if result.success:
-                        if result.output.strip():
-                            result_text = f"\n\n<code_output>\n{result.output.strip()}\n</code_output>\n\n"
-                        else:
-                            result_text = f"\n\n<code_output>\n(出力なし - 実行時間: {result.execution_time:.3f}秒)\n</code_output>\n\n"
-                    else:
-                        error_info = f"エラー: {result.error}"
-                        if result.output.strip():
-                            error_info += f"\n{result.output.strip()}"
-                        error_info += f"\n実行時間: {result.execution_time:.3f}秒"
-                        result_text = f"\n\n<code_output>\n{error_info}\n</code_output>\n\n"
-                    
-                    # Add result after the code block (preserving the original code)
-                    # This keeps the code and adds the output after it
-                    replacement = code_block.raw_content + result_text
-                    modified_text = modified_text.replace(code_block.raw_content, replacement, 1)
-                    executed_any = True
+            # Execute the python blocks concurrently
+            python_blocks = [code_block for code_block in code_blocks if code_block.language == 'python']
+            results = await asyncio.gather(*(self.execute_python_code(code_block.code) for code_block in python_blocks))
             
-            return modified_text, executed_any
+            for code_block, result in zip(python_blocks, results):
+                # Format result using <code_output> tags
+                result_text = f"\n\n{_format_result(result)}\n\n"
+                
+                # Add result after the code block (preserving the original code)
+                # This keeps the code and adds the output after it
+                parts.append(text[cursor:code_block.end])
+                parts.append(result_text)
+                cursor = code_block.end
+                executed_any = True
+            parts.append(text[cursor:])
+            
+            return "".join(parts), executed_any
             
         except Exception as e:
             # If execution fails, return original text
@@ -321,6 +466,8 @@ async def test_code_execution():
         """
     ]
     
+    await executor.warm_up()
+    
     for i, test_case in enumerate(test_cases, 1):
         print(f"\n{'='*60}")
         print(f"Test case {i}:")
@@ -336,6 +483,8 @@ async def test_code_execution():
             print(f"  Block {j}: {'Success' if result.success else 'Failed'}")
             if not result.success:
                 print(f"    Error: {result.error}")
+    
+    await executor.close()
 
 
 if __name__ == "__main__":
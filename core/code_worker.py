@@ -0,0 +1,147 @@
+"""
+Long-lived Python worker used by CodeExecutor.
+
+Reads length-prefixed source code from stdin and writes a length-prefixed
+JSON result ({"stdout", "stderr", "returncode"}) back to the parent.
+
+Each snippet runs in a child forked from this process, so it starts from
+the warm interpreter but cannot leave state behind (cwd, environment,
+monkeypatched modules) or touch the protocol pipes. Where fork is not
+available the snippet runs in-process and the parent does not reuse the
+worker afterwards.
+
+Run as a script: python -u code_worker.py
+"""
+
+import atexit
+import builtins
+import json
+import os
+import sys
+import tempfile
+import threading
+import traceback
+
+_HEADER_SIZE = 4
+_FORK = hasattr(os, "fork")
+# Bound before any snippet runs, so an in-process snippet patching json can't break the framing
+_dumps = json.dumps
+
+
+def _read_exactly(stream, size: int) -> bytes:
+    """Read exactly size bytes, or return b"" on EOF."""
+    data = b""
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            return b""
+        data += chunk
+    return data
+
+
+def _run_snippet(code: str, filename: str) -> int:
+    """Execute code as __main__ and return a process-style exit code."""
+    namespace = {"__name__": "__main__", "__file__": filename, "__builtins__": builtins}
+    try:
+        exec(compile(code, filename, "exec"), namespace)
+        return 0
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            return e.code or 0
+        print(e.code, file=sys.stderr)
+        return 1
+    except BaseException as e:
+        # Skip this frame so the traceback starts at the snippet
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next)
+        return 1
+
+
+def _finish_child(returncode: int) -> None:
+    """Shut the forked child down the way a normal interpreter exit would."""
+    try:
+        # Wait for non-daemon threads and run atexit handlers, like `python script.py`
+        current = threading.current_thread()
+        for thread in threading.enumerate():
+            if thread is not current and not thread.daemon:
+                thread.join()
+        atexit._run_exitfuncs()
+        sys.stdout.flush()
+        sys.stderr.flush()
+    finally:
+        os._exit(returncode)
+
+
+def _execute(code: str, protocol_fds) -> dict:
+    """Run one snippet with stdout/stderr captured to temporary files."""
+    # Files rather than pipes: output written before an abrupt exit is kept,
+    # and background processes holding the descriptors never stall the reply.
+    # The source is written out too, so snippets get a real __file__ and tracebacks show their lines
+    with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err, \
+            tempfile.NamedTemporaryFile("w", suffix=".py", encoding="utf-8") as source:
+        source.write(code)
+        source.flush()
+        if _FORK:
+            pid = os.fork()
+            if pid == 0:
+                returncode = 1
+                try:
+                    for fd in protocol_fds:
+                        os.close(fd)
+                    os.dup2(out.fileno(), 1)
+                    os.dup2(err.fileno(), 2)
+                    returncode = _run_snippet(code, source.name)
+                finally:
+                    _finish_child(returncode)
+            _, status = os.waitpid(pid, 0)
+            returncode = os.waitstatus_to_exitcode(status)
+        else:
+            saved = {fd: os.dup(fd) for fd in (1, 2)}
+            os.dup2(out.fileno(), 1)
+            os.dup2(err.fileno(), 2)
+            try:
+                returncode = _run_snippet(code, source.name)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                for fd, saved_fd in saved.items():
+                    os.dup2(saved_fd, fd)
+                    os.close(saved_fd)
+
+        out.seek(0)
+        err.seek(0)
+        return {
+            "stdout": out.read().decode("utf-8", errors="replace"),
+            "stderr": err.read().decode("utf-8", errors="replace"),
+            "returncode": returncode,
+        }
+
+
+def main() -> None:
+    """Serve snippets until the parent closes stdin."""
+    # Running as a script put core/ first on sys.path; drop it so snippets
+    # importing mcp, llm, ... get the installed packages, not the project's
+    sys.path.pop(0)
+
+    # Keep private copies of the protocol pipes and detach fds 0-2 from them,
+    # so snippet output or input() can never corrupt the framing
+    requests = os.fdopen(os.dup(0), "rb")
+    responses = os.fdopen(os.dup(1), "wb")
+    protocol_fds = (requests.fileno(), responses.fileno())
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+
+    while True:
+        header = _read_exactly(requests, _HEADER_SIZE)
+        if not header:
+            break
+        code = _read_exactly(requests, int.from_bytes(header, "big")).decode("utf-8")
+
+        payload = _dumps(_execute(code, protocol_fds)).encode("utf-8")
+        responses.write(len(payload).to_bytes(_HEADER_SIZE, "big") + payload)
+        responses.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -2,12 +2,17 @@
 Configuration management for Desktop Agent.
 """
 
+import tomllib
 import yaml
-import toml
 from pathlib import Path
 from typing import Dict, Any, Optional
 from pydantic import BaseModel
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
 
 class DesktopAgentConfig(BaseModel):
     """Main configuration class for Desktop Agent."""
@@ -60,6 +65,8 @@ class ConfigManager:
         
         self._system_config: Optional[DesktopAgentConfig] = None
         self._prompt_templates: Optional[PromptTemplates] = None
+        self._tools_desc_cache: Optional[str] = None
+        self._system_mtime: float = 0.0
     
     def load_system_config(self) -> DesktopAgentConfig:
         """Load system configuration from YAML file."""
@@ -67,7 +74,7 @@ class ConfigManager:
             raise FileNotFoundError(f"System config not found: {self.system_config_path}")
         
         with open(self.system_config_path, 'r', encoding='utf-8') as f:
-            config_data = yaml.safe_load(f)
+            config_data = yaml.load(f, Loader=_YamlLoader)
         
         self._system_config = DesktopAgentConfig(**config_data)
         return self._system_config
@@ -77,14 +84,23 @@ class ConfigManager:
         if not self.prompts_config_path.exists():
             raise FileNotFoundError(f"Prompts config not found: {self.prompts_config_path}")
         
-        with open(self.prompts_config_path, 'r', encoding='utf-8') as f:
-            prompts_data = toml.load(f)
+        with open(self.prompts_config_path, 'rb') as f:
+            prompts_data = tomllib.load(f)
         
         self._prompt_templates = PromptTemplates(**prompts_data)
         return self._prompt_templates
     
     def get_system_config(self) -> DesktopAgentConfig:
-        """Get cached system configuration or load it."""
+        """Get cached system configuration, reloading it if the file changed."""
+        try:
+            mtime = self.system_config_path.stat().st_mtime
+        except OSError:
+            mtime = 0.0
+        if mtime != self._system_mtime:
+            self._system_config = None
+            self._tools_desc_cache = None
+            self._system_mtime = mtime
+        
         if self._system_config is None:
             self.load_system_config()
         return self._system_config
@@ -99,6 +115,7 @@ class ConfigManager:
         """Reload all configurations."""
         self._system_config = None
         self._prompt_templates = None
+        self._tools_desc_cache = None
         self.load_system_config()
         self.load_prompt_templates()
     
@@ -162,7 +179,12 @@ class ConfigManager:
     def get_available_tools_description(self) -> str:
         """Generate description of available MCP tools for system prompt."""
         mcp_config = self.get_mcp_config()
-        
+        if self._tools_desc_cache is None:
+            self._tools_desc_cache = self._build_tools_description(mcp_config)
+        return self._tools_desc_cache
+    
+    def _build_tools_description(self, mcp_config: Dict[str, Any]) -> str:
+        """Render the tools description from the MCP configuration."""
         if not mcp_config.get("enabled", False):
             return "No external tools are currently available."
         
@@ -170,7 +192,7 @@ class ConfigManager:
         if not servers:
             return "No MCP servers are configured."
         
-        tools_description = "Available Functions:\n"
+        parts = ["Available Functions:\n"]
         
         for server in servers:
             server_name = server.get("name", "Unknown")
@@ -178,9 +200,9 @@ class ConfigManager:
             tools = server.get("tools", [])
             
             if tools:
-                tools_description += f"\n## {server_name.title()} Server\n"
+                parts.append(f"\n## {server_name.title()} Server\n")
                 if server_desc:
-                    tools_description += f"Description: {server_desc}\n\n"
+                    parts.append(f"Description: {server_desc}\n\n")
                 
                 for tool in tools:
                     if tool.get("type") == "function":
@@ -188,23 +210,23 @@ class ConfigManager:
                         func_name = func.get("name", "unknown")
                         func_desc = func.get("description", "No description")
                         
-                        tools_description += f"### {func_name}\n"
-                        tools_description += f"- **Description**: {func_desc}\n"
+                        parts.append(f"### {func_name}\n")
+                        parts.append(f"- **Description**: {func_desc}\n")
                         
                         # Add parameters information
                         params = func.get("parameters", {})
                         if params and params.get("properties"):
-                            tools_description += "- **Parameters**:\n"
+                            parts.append("- **Parameters**:\n")
                             for param_name, param_info in params["properties"].items():
                                 param_desc = param_info.get("description", "No description")
                                 param_type = param_info.get("type", "unknown")
                                 required = param_name in params.get("required", [])
                                 req_marker = " (required)" if required else " (optional)"
-                                tools_description += f"  - `{param_name}` ({param_type}){req_marker}: {param_desc}\n"
+                                parts.append(f"  - `{param_name}` ({param_type}){req_marker}: {param_desc}\n")
                         
-                        tools_description += "\n"
+                        parts.append("\n")
         
-        return tools_description.strip()
+        return "".join(parts).strip()
     
     def get_system_prompt(self, **kwargs) -> str:
         """Get formatted system prompt with available tools."""
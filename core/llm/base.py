@@ -3,12 +3,14 @@ Base classes for LLM inference engines.
 """
 
 from abc import ABC, abstractmethod
-from typing import Dict, Any, Optional, List, AsyncGenerator
-from pydantic import BaseModel
+from dataclasses import dataclass
+from typing import Dict, Any, Optional, List, AsyncGenerator, Sequence
 import asyncio
+import sys
 
 
-class LLMMessage(BaseModel):
+@dataclass(slots=True)
+class LLMMessage:
     """Standard message format for LLM communication."""
     role: str  # "system", "user", "assistant", "tool"
     content: str
@@ -16,7 +18,8 @@ class LLMMessage(BaseModel):
     metadata: Optional[Dict[str, Any]] = None
 
 
-class LLMResponse(BaseModel):
+@dataclass(slots=True)
+class LLMResponse:
     """Standard response format from LLM."""
     content: str
     usage: Optional[Dict[str, Any]] = None
@@ -24,16 +27,18 @@ class LLMResponse(BaseModel):
     finished: bool = True
 
 
-class CompletionRequest(BaseModel):
+@dataclass(slots=True)
+class CompletionRequest:
     """Request format for completion API."""
     prompt: str
     max_tokens: Optional[int] = None
     temperature: Optional[float] = None
-    stop: Optional[List[str]] = None
+    stop: Optional[Sequence[str]] = None
     stream: bool = False
 
 
-class LLMConfig(BaseModel):
+@dataclass(slots=True)
+class LLMConfig:
     """Configuration for LLM engines."""
     provider: str  # "ollama" or "vllm"
     model: str
@@ -49,9 +54,12 @@ class LLMConfig(BaseModel):
 class BaseLLMEngine(ABC):
     """Abstract base class for LLM engines."""
     
-    def __init__(self, config: LLMConfig):
+    def __init__(self, config: LLMConfig, transport: Optional[Any] = None):
         self.config = config
+        # Optional shared HTTP transport (connection pool) owned by the caller
+        self.transport = transport
         self._initialized = False
+        self._init_lock = asyncio.Lock()
     
     @abstractmethod
     async def initialize(self) -> None:
@@ -104,8 +112,14 @@ class BaseLLMEngine(ABC):
     async def ensure_initialized(self):
         """Ensure the engine is initialized."""
         if not self._initialized:
-            await self.initialize()
-            self._initialized = True
+            await self._init_locked()
+    
+    async def _init_locked(self) -> None:
+        """Run initialize() once, even if several requests race on first use."""
+        async with self._init_lock:
+            if not self._initialized:
+                await self.initialize()
+                self._initialized = True
     
     async def generate_single(
         self,
@@ -150,21 +164,20 @@ class BaseLLMEngine(ABC):
 class LLMEngineFactory:
     """Factory for creating LLM engines."""
     
-    _engines = {}
+    _engines: Dict[str, type] = {}
     
     @classmethod
     def register_engine(cls, provider: str, engine_class: type):
         """Register an LLM engine for a provider."""
-        cls._engines[provider] = engine_class
+        cls._engines[sys.intern(provider)] = engine_class
     
     @classmethod
-    def create_engine(cls, config: LLMConfig) -> BaseLLMEngine:
+    def create_engine(cls, config: LLMConfig, **kwargs) -> BaseLLMEngine:
         """Create an LLM engine based on configuration."""
-        if config.provider not in cls._engines:
+        engine_class = cls._engines.get(config.provider)
+        if engine_class is None:
             raise ValueError(f"Unknown LLM provider: {config.provider}")
-        
-        engine_class = cls._engines[config.provider]
-        return engine_class(config)
+        return engine_class(config, **kwargs)
     
     @classmethod
     def list_providers(cls) -> List[str]:
@@ -2,25 +2,139 @@
 Chat Template Manager for handling different LLM chat formats.
 """
 
+import asyncio
+import json
+import os
 import re
+import string
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 import yaml
 from pathlib import Path
-from typing import Dict, List, Optional, Any, Union
-from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Tuple, Union
+from dataclasses import dataclass, field, fields
 from .base import LLMMessage
 
+_FORMATTER = string.Formatter()
 
-@dataclass
+# Bump when the cached template data changes shape (e.g. ChatTemplate init fields)
+_CACHE_VERSION = 1
+
+# Top-level `name:` line of a template file, read without a full YAML parse
+_NAME_LINE = re.compile(r'^name:[ \t]*(["\']?)(.+?)\1[ \t]*(?:#.*)?$', re.MULTILINE)
+
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+
+def _split_placeholder(template: str, name: str) -> Optional[Tuple[str, str]]:
+    """
+    Pre-render a format string around its only replacement field.
+    
+    Returns (prefix, suffix) with escaped braces already resolved, so that
+    prefix + value + suffix == template.format(**{name: value}); None if the
+    template has any other field, a format spec/conversion, or is malformed.
+    """
+    try:
+        parsed = list(_FORMATTER.parse(template))
+    except ValueError:
+        return None
+    
+    fields_seen = [i for i, (_, field_name, _, _) in enumerate(parsed) if field_name is not None]
+    if len(fields_seen) != 1:
+        return None
+    i = fields_seen[0]
+    _, field_name, format_spec, conversion = parsed[i]
+    if field_name != name or format_spec or conversion:
+        return None
+    
+    prefix = "".join(literal for literal, _, _, _ in parsed[:i + 1])
+    suffix = "".join(literal for literal, _, _, _ in parsed[i + 1:])
+    return prefix, suffix
+
+
+@dataclass(slots=True)
 class ChatTemplate:
     """Chat template configuration."""
     name: str
     description: str
     model_family: str
     format: Dict[str, Optional[str]]
-    stop_tokens: List[str]
+    stop_tokens: Tuple[str, ...]
     defaults: Dict[str, Any]
     completion: Dict[str, Any]
     compatible_models: List[str]
+    compiled_patterns: Tuple[re.Pattern, ...] = field(init=False, repr=False, compare=False)
+    # compiled_patterns as one alternation; None when they can't be combined safely
+    compiled_union: Optional[re.Pattern] = field(init=False, repr=False, compare=False)
+    # Role -> (prefix, suffix) around {content}, for roles that can skip str.format
+    format_fragments: Dict[str, Tuple[str, str]] = field(init=False, repr=False, compare=False)
+    completion_stop_tokens: Tuple[str, ...] = field(init=False, repr=False, compare=False)
+    completion_enabled: bool = field(init=False, repr=False, compare=False)
+    # True when every message role formats as prefix + content + suffix
+    uniform_shape: bool = field(init=False, repr=False, compare=False)
+    # Structured-message template (OpenAI style) rather than a string format
+    is_api_style: bool = field(init=False, repr=False, compare=False)
+    default_add_generation_prompt: bool = field(init=False, repr=False, compare=False)
+    generation_prompt: str = field(init=False, repr=False, compare=False)
+    # (prefix, suffix) around {partial_content} in completion.continue_template, if splittable
+    completion_fragments: Optional[Tuple[str, str]] = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        # Interned role keys: lookups with the role literals used for messages hit by identity
+        self.format = {sys.intern(role): role_template for role, role_template in self.format.items()}
+        # Stop tokens are shared read-only with callers, so keep them immutable
+        self.stop_tokens = tuple(self.stop_tokens)
+        self.completion_stop_tokens = tuple(self.completion.get('completion_stop_tokens', self.stop_tokens))
+        self.completion_enabled = bool(self.completion.get('enabled', False))
+        self.is_api_style = self.name == "openai" or self.format.get('system') is None
+        self.default_add_generation_prompt = bool(self.defaults.get('add_generation_prompt', True))
+        self.generation_prompt = self.format.get('generation_prompt') or ""
+        self.completion_fragments = _split_placeholder(
+            self.completion.get('continue_template', '{partial_content}'), "partial_content"
+        )
+        
+        compiled = []
+        for pattern in self.compatible_models:
+            try:
+                compiled.append(re.compile(pattern, re.IGNORECASE))
+            except re.error as e:
+                print(f"Warning: Skipping invalid model pattern {pattern!r} in template {self.name}: {e}")
+        self.compiled_patterns = tuple(compiled)
+        
+        # One alternation of the valid patterns ((?!) never matches). Capture groups
+        # would be renumbered inside it, breaking backreferences, and inline global
+        # flags such as (?i) are rejected mid-pattern; such templates match pattern by pattern
+        self.compiled_union = None
+        if not any(compiled_pattern.groups for compiled_pattern in compiled):
+            try:
+                self.compiled_union = re.compile(
+                    "|".join(f"(?:{compiled_pattern.pattern})" for compiled_pattern in compiled) or r"(?!)",
+                    re.IGNORECASE
+                )
+            except re.error:
+                pass
+        
+        self.format_fragments = {}
+        for role, role_template in self.format.items():
+            if isinstance(role_template, str):
+                fragments = _split_placeholder(role_template, "content")
+                if fragments is not None:
+                    self.format_fragments[role] = fragments
+        self.uniform_shape = bool(self.format_fragments) and all(
+            role in self.format_fragments
+            for role in self.format
+            if role != 'generation_prompt'
+        )
+    
+    def matches_model(self, model_name: str) -> bool:
+        """Check whether any compatible_models pattern matches model_name."""
+        if self.compiled_union is not None:
+            return self.compiled_union.search(model_name) is not None
+        return any(compiled_pattern.search(model_name) for compiled_pattern in self.compiled_patterns)
 
 
 class ChatTemplateManager:
@@ -32,7 +146,10 @@ class ChatTemplateManager:
     def __init__(self, templates_dir: str = "config/chat_templates"):
         self.templates_dir = Path(templates_dir)
         self._templates: Dict[str, ChatTemplate] = {}
-        self._loaded = False
+        self._file_index: Optional[Dict[str, Path]] = None  # Template name -> file, for lazy loading
+        self._loaded = False  # True once every template file has been loaded
+        self._master_regex: Optional[re.Pattern] = None
+        self._group_to_template: Dict[str, str] = {}
     
     def load_templates(self) -> None:
         """Load all chat templates from the templates directory."""
@@ -41,28 +158,133 @@ class ChatTemplateManager:
         
         self._templates.clear()
         
-        for template_file in self.templates_dir.glob("*.yaml"):
+        template_files = sorted(self.templates_dir.glob("*.yaml"))
+        cache_key = self._cache_key(template_files)
+        cached = self._read_cache(cache_key)
+        
+        if cached is not None:
             try:
-                template = self._load_template_file(template_file)
-                self._templates[template.name] = template
-            except Exception as e:
-                print(f"Warning: Failed to load template {template_file}: {e}")
+                for data in cached:
+                    self._templates[data['name']] = ChatTemplate(**data)
+            except Exception:
+                # Written by another build or edited by hand: re-parse the YAML files
+                self._templates.clear()
+                cached = None
+        
+        if cached is None:
+            failed = False
+            # Parse files in parallel, but collect in file order so the
+            # template order (and auto-detect priority) stays deterministic
+            with ThreadPoolExecutor(max_workers=max(1, min(8, len(template_files)))) as executor:
+                futures = [executor.submit(self._load_template_file, f) for f in template_files]
+                for template_file, future in zip(template_files, futures):
+                    try:
+                        template = future.result()
+                        self._templates[template.name] = template
+                    except Exception as e:
+                        failed = True
+                        print(f"Warning: Failed to load template {template_file}: {e}")
+            
+            # Only cache a clean load, so broken files keep warning
+            if not failed:
+                self._write_cache(cache_key)
         
         if not self._templates:
             raise RuntimeError("No chat templates found. Please ensure template files exist.")
         
+        self._build_master_regex()
         self._loaded = True
     
+    async def load_templates_async(self) -> None:
+        """Load all chat templates on a worker thread, keeping the event loop free."""
+        await asyncio.to_thread(self.load_templates)
+    
+    @property
+    def _cache_path(self) -> Path:
+        return self.templates_dir / ".cache.json"
+    
+    @staticmethod
+    def _cache_key(template_files: List[Path]) -> Dict[str, Any]:
+        """Identify the cache format and the current template files by name, mtime and size."""
+        files = []
+        for template_file in template_files:
+            stat = template_file.stat()
+            files.append([template_file.name, stat.st_mtime_ns, stat.st_size])
+        return {'version': _CACHE_VERSION, 'files': files}
+    
+    def _read_cache(self, cache_key: Dict[str, Any]) -> Optional[List[Dict[str, Any]]]:
+        """Return cached template data if it was written for the same files."""
+        try:
+            with open(self._cache_path, 'rb') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+        
+        if not isinstance(cache, dict) or cache.get('key') != cache_key:
+            return None
+        templates = cache.get('templates')
+        return templates if isinstance(templates, list) else None
+    
+    @staticmethod
+    def _template_to_dict(template: ChatTemplate) -> Dict[str, Any]:
+        """Serialisable constructor arguments of a template (derived fields dropped)."""
+        return {f.name: getattr(template, f.name) for f in fields(template) if f.init}
+    
+    def _write_cache(self, cache_key: Dict[str, Any]) -> None:
+        """Persist the loaded templates as JSON (best effort, atomic replace)."""
+        cache = {
+            'key': cache_key,
+            'templates': [self._template_to_dict(template) for template in self._templates.values()],
+        }
+        tmp_path = self._cache_path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self._cache_path)
+        except (OSError, TypeError, ValueError):
+            # Read-only config dir or non-JSON template values: just skip caching
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
+    
+    def _build_master_regex(self) -> None:
+        """
+        Combine every template's model patterns into one regex.
+        
+        Each template becomes a lookahead alternative anchored at the start,
+        tried in template order, so match.lastgroup names the same template
+        the per-template search loop would have picked.
+        """
+        alternatives = []
+        self._group_to_template = {}
+        for i, (template_name, template) in enumerate(self._templates.items()):
+            if not template.compatible_models:
+                continue
+            if template.compiled_union is None:
+                # Patterns that can't share one regex; search template by template
+                self._master_regex = None
+                return
+            group = f"t_{i}"
+            alternatives.append(f"(?P<{group}>(?=[\\s\\S]*?(?:{template.compiled_union.pattern})))")
+            self._group_to_template[group] = template_name
+        
+        try:
+            self._master_regex = re.compile(r"\A(?:" + "|".join(alternatives) + ")", re.IGNORECASE) if alternatives else None
+        except re.error:
+            # e.g. patterns reusing group names across templates; search them one by one
+            self._master_regex = None
+    
     def _load_template_file(self, template_file: Path) -> ChatTemplate:
         """Load a single template file."""
-        with open(template_file, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+        with open(template_file, 'rb') as f:
+            data = yaml.load(f, Loader=_YamlLoader)
         
         # Validate required fields
         required_fields = ['name', 'description', 'format', 'stop_tokens', 'defaults']
-        for field in required_fields:
-            if field not in data:
-                raise ValueError(f"Missing required field '{field}' in template {template_file}")
+        for required in required_fields:
+            if required not in data:
+                raise ValueError(f"Missing required field '{required}' in template {template_file}")
         
         return ChatTemplate(
             name=data['name'],
@@ -75,16 +297,44 @@ class ChatTemplateManager:
             compatible_models=data.get('compatible_models', [])
         )
     
+    def invalidate(self) -> None:
+        """Forget loaded templates so they are re-read on next use."""
+        self._templates.clear()
+        self._file_index = None
+        self._master_regex = None
+        self._group_to_template = {}
+        self._loaded = False
+    
+    def _get_file_index(self) -> Dict[str, Path]:
+        """Map template names to files by reading only their `name:` lines."""
+        if self._file_index is None:
+            if not self.templates_dir.exists():
+                raise FileNotFoundError(f"Chat templates directory not found: {self.templates_dir}")
+            
+            index = {}
+            for template_file in sorted(self.templates_dir.glob("*.yaml")):
+                match = _NAME_LINE.search(template_file.read_text(encoding='utf-8'))
+                if match:
+                    index[match.group(2)] = template_file
+            self._file_index = index
+        return self._file_index
+    
     def get_template(self, template_name: str) -> ChatTemplate:
-        """Get a specific template by name."""
-        if not self._loaded:
-            self.load_templates()
+        """Get a specific template by name, parsing only its file on first use."""
+        template = self._templates.get(template_name)
+        if template is not None:
+            return template
         
-        if template_name not in self._templates:
-            available = list(self._templates.keys())
-            raise ValueError(f"Template '{template_name}' not found. Available: {available}")
+        if not self._loaded:
+            template_file = self._get_file_index().get(template_name)
+            if template_file is not None:
+                template = self._load_template_file(template_file)
+                self._templates[template.name] = template
+                if template.name == template_name:
+                    return template
         
-        return self._templates[template_name]
+        available = self.list_templates()
+        raise ValueError(f"Template '{template_name}' not found. Available: {available}")
     
     def auto_detect_template(self, model_name: str) -> str:
         """Auto-detect the best template for a given model name."""
@@ -92,9 +342,13 @@ class ChatTemplateManager:
             self.load_templates()
         
         # Try to match model name against compatible models
-        for template_name, template in self._templates.items():
-            for pattern in template.compatible_models:
-                if re.search(pattern, model_name, re.IGNORECASE):
+        if self._master_regex is not None:
+            match = self._master_regex.search(model_name)
+            if match:
+                return self._group_to_template[match.lastgroup]
+        else:
+            for template_name, template in self._templates.items():
+                if template.matches_model(model_name):
                     return template_name
         
         # Default fallback
@@ -109,7 +363,7 @@ class ChatTemplateManager:
     def list_templates(self) -> List[str]:
         """List all available template names."""
         if not self._loaded:
-            self.load_templates()
+            return list(self._get_file_index())
         return list(self._templates.keys())
     
     def format_messages(
@@ -132,36 +386,57 @@ class ChatTemplateManager:
         template = self.get_template(template_name)
         
         if add_generation_prompt is None:
-            add_generation_prompt = template.defaults.get('add_generation_prompt', True)
+            add_generation_prompt = template.default_add_generation_prompt
         
-        formatted_parts = []
+        generation_prompt = template.generation_prompt if add_generation_prompt else ""
+        
+        if template.uniform_shape:
+            fragments_by_role = template.format_fragments
+            try:
+                pieces = chain.from_iterable(
+                    (fragments_by_role[message.role][0], message.content, fragments_by_role[message.role][1])
+                    for message in messages
+                )
+                if generation_prompt:
+                    pieces = chain(pieces, (generation_prompt,))
+                return "".join(pieces)
+            except KeyError:
+                pass  # Role the template does not define; the loop below reports it
+        
+        parts: List[str] = []
+        append = parts.append
+        fragments_by_role = template.format_fragments
         
         for message in messages:
             role = message.role
             content = message.content
             
+            # Fast path: emit prefix, content and suffix without formatting
+            fragments = fragments_by_role.get(role)
+            if fragments is not None:
+                append(fragments[0])
+                append(content)
+                append(fragments[1])
+                continue
+            
             # Get template for this role
             role_template = template.format.get(role)
             if role_template is None:
                 # Handle special case for OpenAI-style templates
-                if template.name == "openai":
+                if template.is_api_style:
                     # OpenAI templates use structured messages, not string formatting
                     continue
                 else:
                     raise ValueError(f"No template found for role '{role}' in template '{template_name}'")
             
             # Format the message
-            formatted_message = role_template.format(content=content)
-            formatted_parts.append(formatted_message)
-        
-        # Join all parts
-        result = "".join(formatted_parts)
+            append(role_template.format(content=content))
         
         # Add generation prompt if requested
-        if add_generation_prompt and template.format.get('generation_prompt'):
-            result += template.format['generation_prompt']
+        if generation_prompt:
+            append(generation_prompt)
         
-        return result
+        return "".join(parts)
     
     def format_messages_for_api(
         self,
@@ -184,22 +459,20 @@ class ChatTemplateManager:
         template = self.get_template(template_name)
         
         # Check if this is an API-style template (like OpenAI)
-        if template.name == "openai" or template.format.get('system') is None:
+        if template.is_api_style:
             # Return structured messages for API calls
             return [{"role": msg.role, "content": msg.content} for msg in messages]
         else:
             # Return formatted string for completion-style APIs
             return self.format_messages(messages, template_name, add_generation_prompt=False)
     
-    def get_stop_tokens(self, template_name: str) -> List[str]:
+    def get_stop_tokens(self, template_name: str) -> Tuple[str, ...]:
         """Get stop tokens for the specified template."""
-        template = self.get_template(template_name)
-        return template.stop_tokens.copy()
+        return self.get_template(template_name).stop_tokens
     
     def supports_completion(self, template_name: str) -> bool:
         """Check if the template supports completion mode."""
-        template = self.get_template(template_name)
-        return template.completion.get('enabled', False)
+        return self.get_template(template_name).completion_enabled
     
     def format_for_completion(
         self,
@@ -218,13 +491,16 @@ class ChatTemplateManager:
         """
         template = self.get_template(template_name)
         
-        if not self.supports_completion(template_name):
+        if not template.completion_enabled:
             raise ValueError(f"Template '{template_name}' does not support completion mode")
         
+        fragments = template.completion_fragments
+        if fragments is not None:
+            return fragments[0] + partial_content + fragments[1]
+        
         completion_template = template.completion.get('continue_template', '{partial_content}')
         return completion_template.format(partial_content=partial_content)
     
-    def get_completion_stop_tokens(self, template_name: str) -> List[str]:
+    def get_completion_stop_tokens(self, template_name: str) -> Tuple[str, ...]:
         """Get stop tokens for completion mode."""
-        template = self.get_template(template_name)
-        return template.completion.get('completion_stop_tokens', template.stop_tokens).copy()
\ No newline at end of file
+        return self.get_template(template_name).completion_stop_tokens
\ No newline at end of file
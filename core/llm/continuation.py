@@ -2,10 +2,17 @@
 LLM Continuation Manager for handling tool/code execution result integration.
 """
 
-from typing import List, Dict, Any, Optional, AsyncGenerator
+from typing import List, Dict, Any, Optional, AsyncGenerator, Sequence, Tuple
 from .base import LLMMessage, LLMResponse
 from .manager import LLMManager
 
+# Fixed pieces of the execution-result blocks spliced into continuations
+_TOOL_PRE = "\n\n**Tool Execution Result ("
+_TOOL_MID = "):**\n"
+_CODE_PRE = "\n\n**Code Execution Output:**\n```\n"
+_CODE_SUF = "\n```\n\n"
+_RESULT_SUF = "\n\n"
+
 
 class ContinuationManager:
     """
@@ -15,6 +22,19 @@ class ContinuationManager:
     
     def __init__(self, llm_manager: LLMManager):
         self.llm_manager = llm_manager
+        self._template_info: Optional[Dict[str, Any]] = None  # Cached until refresh()
+    
+    def refresh(self) -> None:
+        """Drop cached template details (call after the LLM manager switches template)."""
+        self._template_info = None
+    
+    def _get_template_info(self) -> Dict[str, Any]:
+        if self._template_info is None:
+            template_info = self.llm_manager.get_template_info()
+            if not template_info:
+                return template_info  # No template loaded yet; don't cache the miss
+            self._template_info = template_info
+        return self._template_info
     
     async def continue_with_tool_result(
         self,
@@ -42,12 +62,10 @@ class ContinuationManager:
         # Format tool result for inclusion
         tool_result_formatted = self._format_tool_result(tool_name, tool_result)
         
-        # Create the continuation prompt
-        continuation_content = partial_assistant_response + tool_result_formatted
-        
         return await self._continue_generation(
             conversation_messages,
-            continuation_content,
+            partial_assistant_response,
+            tool_result_formatted,
             max_continuation_tokens,
             stream
         )
@@ -78,12 +96,10 @@ class ContinuationManager:
         # Format code result for inclusion
         code_result_formatted = self._format_code_result(code, code_output)
         
-        # Create the continuation prompt
-        continuation_content = partial_assistant_response + code_result_formatted
-        
         return await self._continue_generation(
             conversation_messages,
-            continuation_content,
+            partial_assistant_response,
+            code_result_formatted,
             max_continuation_tokens,
             stream
         )
@@ -109,11 +125,10 @@ class ContinuationManager:
         Returns:
             Continued LLM response
         """
-        continuation_content = partial_assistant_response + additional_content
-        
         return await self._continue_generation(
             conversation_messages,
-            continuation_content,
+            partial_assistant_response,
+            additional_content,
             max_continuation_tokens,
             stream
         )
@@ -121,16 +136,23 @@ class ContinuationManager:
     async def _continue_generation(
         self,
         conversation_messages: List[LLMMessage],
-        continuation_content: str,
+        partial_assistant_response: str,
+        additional_content: str,
         max_continuation_tokens: Optional[int],
         stream: bool
     ) -> LLMResponse:
-        """Internal method to handle continuation generation."""
+        """
+        Internal method to handle continuation generation.
+        
+        The partial response and the added content are passed separately so
+        each final string is built with a single join.
+        """
         
         # Format the conversation for completion continuation
         completion_prompt = self.llm_manager.format_for_completion_continuation(
             conversation_messages,
-            continuation_content
+            partial_assistant_response,
+            additional_content
         )
         
         # Get template-specific stop tokens for completion mode
@@ -152,7 +174,7 @@ class ContinuationManager:
             )
             
             # Combine original content with continuation
-            full_content = continuation_content + response.content
+            full_content = "".join((partial_assistant_response, additional_content, response.content))
             
             return LLMResponse(
                 content=full_content,
@@ -164,7 +186,7 @@ class ContinuationManager:
     async def _stream_continuation(
         self,
         completion_prompt: str,
-        stop_tokens: List[str],
+        stop_tokens: Sequence[str],
         max_continuation_tokens: Optional[int]
     ) -> AsyncGenerator[LLMResponse, None]:
         """Stream continuation generation."""
@@ -177,20 +199,19 @@ class ContinuationManager:
     
     def _format_tool_result(self, tool_name: str, tool_result: str) -> str:
         """Format tool execution result for continuation."""
-        return f"\n\n**Tool Execution Result ({tool_name}):**\n{tool_result}\n\n"
+        return _TOOL_PRE + tool_name + _TOOL_MID + tool_result + _RESULT_SUF
     
     def _format_code_result(self, code: str, code_output: str) -> str:
         """Format code execution result for continuation."""
-        return f"\n\n**Code Execution Output:**\n```\n{code_output}\n```\n\n"
+        return _CODE_PRE + code_output + _CODE_SUF
     
     def supports_continuation(self) -> bool:
         """Check if the current template supports continuation."""
-        template_info = self.llm_manager.get_template_info()
-        return template_info.get("supports_completion", False)
+        return self._get_template_info().get("supports_completion", False)
     
     def get_continuation_settings(self) -> Dict[str, Any]:
         """Get settings for continuation mode."""
-        template_info = self.llm_manager.get_template_info()
+        template_info = self._get_template_info()
         return {
             "template_name": template_info.get("name"),
             "supports_continuation": template_info.get("supports_completion", False),
@@ -206,13 +227,35 @@ class ConversationState:
     
     def __init__(self):
         self.messages: List[LLMMessage] = []
+        self._messages_version = 0  # Bumped on every change to messages
+        self._cached_copy: Optional[Tuple[int, Tuple[LLMMessage, ...]]] = None
         self.current_assistant_response: str = ""
-        self.pending_tool_results: List[Dict[str, Any]] = []
-        self.pending_code_results: List[Dict[str, Any]] = []
+        # Pending results as parallel columns rather than one dict per result
+        self.pending_tool_names: List[str] = []
+        self.pending_tool_outputs: List[str] = []
+        self.pending_code_sources: List[str] = []
+        self.pending_code_outputs: List[str] = []
+    
+    @property
+    def pending_tool_results(self) -> List[Dict[str, Any]]:
+        """Pending tool results as {"tool_name", "result"} dicts (built on access)."""
+        return [
+            {"tool_name": tool_name, "result": result}
+            for tool_name, result in zip(self.pending_tool_names, self.pending_tool_outputs)
+        ]
+    
+    @property
+    def pending_code_results(self) -> List[Dict[str, Any]]:
+        """Pending code results as {"code", "output"} dicts (built on access)."""
+        return [
+            {"code": code, "output": output}
+            for code, output in zip(self.pending_code_sources, self.pending_code_outputs)
+        ]
     
     def add_message(self, message: LLMMessage) -> None:
         """Add a message to the conversation."""
         self.messages.append(message)
+        self._messages_version += 1
     
     def start_assistant_response(self, content: str = "") -> None:
         """Start tracking an assistant response."""
@@ -224,17 +267,13 @@ class ConversationState:
     
     def add_tool_result(self, tool_name: str, result: str) -> None:
         """Add a tool execution result."""
-        self.pending_tool_results.append({
-            "tool_name": tool_name,
-            "result": result
-        })
+        self.pending_tool_names.append(tool_name)
+        self.pending_tool_outputs.append(result)
     
     def add_code_result(self, code: str, output: str) -> None:
         """Add a code execution result."""
-        self.pending_code_results.append({
-            "code": code,
-            "output": output
-        })
+        self.pending_code_sources.append(code)
+        self.pending_code_outputs.append(output)
     
     def finalize_assistant_response(self) -> LLMMessage:
         """Finalize the current assistant response and add it to messages."""
@@ -243,15 +282,25 @@ class ConversationState:
             content=self.current_assistant_response
         )
         self.messages.append(message)
+        self._messages_version += 1
         self.current_assistant_response = ""
-        self.pending_tool_results.clear()
-        self.pending_code_results.clear()
+        self.pending_tool_names.clear()
+        self.pending_tool_outputs.clear()
+        self.pending_code_sources.clear()
+        self.pending_code_outputs.clear()
         return message
     
-    def get_conversation_copy(self) -> List[LLMMessage]:
-        """Get a copy of the conversation messages."""
-        return self.messages.copy()
+    def get_conversation_copy(self) -> Tuple[LLMMessage, ...]:
+        """
+        Get a read-only snapshot of the conversation messages.
+        
+        The same tuple is returned until the conversation changes.
+        """
+        cached = self._cached_copy
+        if cached is None or cached[0] != self._messages_version or len(cached[1]) != len(self.messages):
+            cached = self._cached_copy = (self._messages_version, tuple(self.messages))
+        return cached[1]
     
     def has_pending_results(self) -> bool:
         """Check if there are pending tool or code results."""
-        return bool(self.pending_tool_results or self.pending_code_results)
\ No newline at end of file
+        return bool(self.pending_tool_names or self.pending_code_sources)
\ No newline at end of file
@@ -3,14 +3,21 @@ LLM Manager for handling multiple LLM engines and configurations.
 """
 
 import yaml
-import asyncio
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Sequence, Tuple
 from pathlib import Path
 from .base import BaseLLMEngine, LLMConfig, LLMMessage, LLMResponse, CompletionRequest, LLMEngineFactory
 from .ollama_engine import OllamaEngine
 from .vllm_engine import VLLMEngine
 from .chat_template import ChatTemplateManager
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
+# Parsed config files keyed by (resolved path, mtime_ns, size); values are shared, treat as read-only
+_YAML_CACHE: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+
 
 class LLMManager:
     """
@@ -25,6 +32,9 @@ class LLMManager:
         self.config: Optional[LLMConfig] = None
         self.chat_template_manager = ChatTemplateManager(self.templates_dir)
         self.current_template: Optional[str] = None
+        self._transport = None  # Optional shared HTTP transport passed to engines
+        # Last formatted conversation: (template, ((role, content), ...), text without generation prompt)
+        self._format_cache: Optional[Tuple[str, Tuple[Tuple[str, str], ...], str]] = None
         self._initialized = False
     
     async def initialize(self) -> None:
@@ -33,6 +43,14 @@ class LLMManager:
         await self.create_engine()
         self._initialized = True
     
+    def attach_transport(self, transport) -> None:
+        """
+        Share an HTTP transport (connection pool) with engines created from now on.
+        
+        The caller owns the transport and is responsible for closing it.
+        """
+        self._transport = transport
+    
     async def load_config(self) -> None:
         """Load configuration from YAML file."""
         config_file = Path(self.config_path)
@@ -40,8 +58,16 @@ class LLMManager:
         if not config_file.exists():
             raise FileNotFoundError(f"Configuration file not found: {self.config_path}")
         
-        with open(config_file, 'r', encoding='utf-8') as f:
-            full_config = yaml.safe_load(f)
+        stat = config_file.stat()
+        cache_key = (str(config_file.resolve()), stat.st_mtime_ns, stat.st_size)
+        full_config = _YAML_CACHE.get(cache_key)
+        if full_config is None:
+            with open(config_file, 'r', encoding='utf-8') as f:
+                full_config = yaml.load(f, Loader=_YamlLoader)
+            # Forget earlier versions of this file before caching the new one
+            for stale_key in [key for key in _YAML_CACHE if key[0] == cache_key[0]]:
+                del _YAML_CACHE[stale_key]
+            _YAML_CACHE[cache_key] = full_config
         
         llm_config = full_config.get("llm", {})
         
@@ -69,8 +95,8 @@ class LLMManager:
             await self.close_engine()
         
         # Create new engine
-        self.engine = LLMEngineFactory.create_engine(self.config)
-        await self.engine.initialize()
+        self.engine = LLMEngineFactory.create_engine(self.config, transport=self._transport)
+        await self.engine.ensure_initialized()
     
     async def close_engine(self) -> None:
         """Close the current engine."""
@@ -105,20 +131,14 @@ class LLMManager:
         if not self.engine:
             raise RuntimeError("LLM engine not initialized")
         
-        response = await self.engine.generate(messages, stream=False, **kwargs)
-        
-        if isinstance(response, LLMResponse):
-            return response
-        else:
-            # If it's a generator, collect all responses
-            content_parts = []
-            async for chunk in response:
-                content_parts.append(chunk.content)
-            
-            return LLMResponse(
-                content="".join(content_parts),
-                finished=True
-            )
+        # Engines return a complete LLMResponse when stream=False
+        return await self.engine.generate(messages, stream=False, **kwargs)
+    
+    @staticmethod
+    async def _collect_stream(response) -> LLMResponse:
+        """Collect streamed chunks into a single finished response."""
+        content_parts = [chunk.content async for chunk in response]
+        return LLMResponse(content="".join(content_parts), finished=True)
     
     async def generate_stream(
         self,
@@ -203,8 +223,9 @@ class LLMManager:
     async def _load_chat_template_config(self, llm_config: Dict[str, Any]) -> None:
         """Load chat template configuration."""
         try:
-            # Load all available templates
-            self.chat_template_manager.load_templates()
+            # Drop templates from a previous load; they are re-read on demand
+            self.chat_template_manager.invalidate()
+            self._format_cache = None
             
             template_config = llm_config.get("chat_template", {})
             template_name = template_config.get("template", "auto")
@@ -212,6 +233,8 @@ class LLMManager:
             
             # Determine which template to use
             if template_name == "auto" or auto_detect:
+                # Detection needs every template; parse them off the event loop
+                await self.chat_template_manager.load_templates_async()
                 self.current_template = self.chat_template_manager.auto_detect_template(self.config.model)
             else:
                 self.current_template = template_name
@@ -233,7 +256,7 @@ class LLMManager:
         prompt: str,
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
-        stop: Optional[List[str]] = None,
+        stop: Optional[Sequence[str]] = None,
         stream: bool = False,
         **kwargs
     ) -> LLMResponse:
@@ -266,25 +289,16 @@ class LLMManager:
         
         response = await self.engine.completion(request, **kwargs)
         
-        if isinstance(response, LLMResponse):
-            return response
-        else:
-            # If it's a generator, collect all responses
-            content_parts = []
-            async for chunk in response:
-                content_parts.append(chunk.content)
-            
-            return LLMResponse(
-                content="".join(content_parts),
-                finished=True
-            )
+        if stream:
+            return await self._collect_stream(response)
+        return response
     
     async def completion_stream(
         self,
         prompt: str,
         max_tokens: Optional[int] = None,
         temperature: Optional[float] = None,
-        stop: Optional[List[str]] = None,
+        stop: Optional[Sequence[str]] = None,
         **kwargs
     ):
         """
@@ -341,16 +355,40 @@ class LLMManager:
         if not self.current_template:
             raise RuntimeError("No chat template loaded")
         
-        return self.chat_template_manager.format_messages(
-            messages, 
-            self.current_template, 
-            add_generation_prompt
-        )
+        return self._format_incremental(messages, add_generation_prompt)
+    
+    def _format_incremental(
+        self,
+        messages: List[LLMMessage],
+        add_generation_prompt: Optional[bool]
+    ) -> str:
+        """
+        Format messages with the current template, reusing the previous result.
+        
+        Templates render each message independently, so when the previous
+        call's messages are a prefix of these only the new tail is formatted.
+        """
+        template_name = self.current_template
+        template_manager = self.chat_template_manager
+        keys = tuple((message.role, message.content) for message in messages)
+        
+        cached = self._format_cache
+        if cached is not None and cached[0] == template_name and keys[:len(cached[1])] == cached[1]:
+            body = cached[2] + template_manager.format_messages(messages[len(cached[1]):], template_name, False)
+        else:
+            body = template_manager.format_messages(messages, template_name, False)
+        self._format_cache = (template_name, keys, body)
+        
+        template = template_manager.get_template(template_name)
+        if add_generation_prompt is None:
+            add_generation_prompt = template.default_add_generation_prompt
+        return body + template.generation_prompt if add_generation_prompt else body
     
     def format_for_completion_continuation(
         self,
         messages: List[LLMMessage],
-        partial_assistant_content: str
+        partial_assistant_content: str,
+        additional_content: str = ""
     ) -> str:
         """
         Format messages for completion continuation.
@@ -359,6 +397,8 @@ class LLMManager:
         Args:
             messages: Previous conversation messages
             partial_assistant_content: Partial assistant response content
+            additional_content: Content appended after the partial response
+                (e.g. a formatted execution result)
             
         Returns:
             Formatted prompt for completion
@@ -366,18 +406,15 @@ class LLMManager:
         if not self.current_template:
             raise RuntimeError("No chat template loaded")
         
-        if not self.chat_template_manager.supports_completion(self.current_template):
+        template_manager = self.chat_template_manager
+        if not template_manager.get_template(self.current_template).completion_enabled:
             raise ValueError(f"Template '{self.current_template}' does not support completion mode")
         
-        # Format the full conversation first
-        full_conversation = self.format_chat_messages(messages, add_generation_prompt=True)
-        
-        # Add the partial assistant content
-        full_conversation += partial_assistant_content
-        
-        return full_conversation
+        # Format the full conversation, then add the partial assistant content
+        full_conversation = self._format_incremental(messages, True)
+        return "".join((full_conversation, partial_assistant_content, additional_content))
     
-    def get_template_stop_tokens(self, completion_mode: bool = False) -> List[str]:
+    def get_template_stop_tokens(self, completion_mode: bool = False) -> Tuple[str, ...]:
         """
         Get stop tokens for the current template.
         
@@ -385,7 +422,7 @@ class LLMManager:
             completion_mode: Whether to get completion-specific stop tokens
             
         Returns:
-            List of stop tokens
+            Tuple of stop tokens (shared, read-only)
         """
         if not self.current_template:
             raise RuntimeError("No chat template loaded")
@@ -406,7 +443,7 @@ class LLMManager:
                 "name": template.name,
                 "description": template.description,
                 "model_family": template.model_family,
-                "supports_completion": template.completion.get("enabled", False),
+                "supports_completion": template.completion_enabled,
                 "stop_tokens": template.stop_tokens,
             }
         except Exception:
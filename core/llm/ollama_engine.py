@@ -4,24 +4,95 @@ Ollama LLM engine implementation.
 
 import json
 import asyncio
-from typing import List, Dict, Any, Optional, AsyncGenerator
+import time
+from typing import List, Dict, Any, Optional, AsyncGenerator, Callable
 import httpx
 from .base import BaseLLMEngine, LLMConfig, LLMMessage, LLMResponse, CompletionRequest, LLMEngineFactory
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize a request payload to UTF-8 JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+_EMPTY: Dict[str, Any] = {}
+_END = object()  # End-of-stream marker for anext()
+
+
+def _chat_content(chunk: Dict[str, Any]) -> str:
+    """Token text of an /api/chat stream chunk."""
+    return (chunk.get("message") or _EMPTY).get("content", "")
+
+
+def _completion_content(chunk: Dict[str, Any]) -> str:
+    """Token text of an /api/generate stream chunk."""
+    return chunk.get("response", "")
+
+
+async def _iter_json_lines(response: httpx.Response) -> AsyncGenerator[Dict[str, Any], None]:
+    """Yield each newline-delimited JSON object of a streamed response, skipping bad lines."""
+    buf = bytearray()
+    # No chunk_size: httpx would hold data back until that many bytes arrived
+    async for data in response.aiter_bytes():
+        buf.extend(data)
+        start = 0
+        while (nl := buf.find(b"\n", start)) != -1:
+            line = bytes(buf[start:nl])
+            start = nl + 1
+            if line.strip():
+                try:
+                    yield _loads(line)
+                except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses this
+                    continue
+        del buf[:start]
+    
+    # The final object may not be newline-terminated
+    if buf.strip():
+        try:
+            yield _loads(bytes(buf))
+        except json.JSONDecodeError:
+            pass
+
 
 class OllamaEngine(BaseLLMEngine):
     """Ollama LLM engine implementation."""
     
-    def __init__(self, config: LLMConfig):
-        super().__init__(config)
+    def __init__(self, config: LLMConfig, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(config, transport)
         self.client = None
         self.base_url = config.endpoint.rstrip('/')
+        
+        # Stream coalescing: merge up to N chunks or T ms of tokens per yielded response
+        ollama_config = (config.provider_config or {}).get("ollama") or {}
+        self.stream_coalesce_chunks = int(ollama_config.get("stream_coalesce_chunks", 16))
+        self.stream_coalesce_ms = float(ollama_config.get("stream_coalesce_ms", 15))
+        
+        # Request options that only change with the config, merged once
+        self._provider_options: Dict[str, Any] = dict((config.provider_config or {}).get("options", {}))
+        self._chat_options: Dict[str, Any] = {
+            "temperature": config.temperature,
+            "num_predict": config.max_tokens,
+            **self._provider_options,
+        }
     
     async def initialize(self) -> None:
         """Initialize the Ollama client."""
+        # Connection pooling is shared through the transport the manager attaches
         self.client = httpx.AsyncClient(
             timeout=httpx.Timeout(self.config.timeout),
-            base_url=self.base_url
+            base_url=self.base_url,
+            transport=self.transport
         )
         
         # Test connection
@@ -45,31 +116,26 @@ class OllamaEngine(BaseLLMEngine):
         **kwargs
     ) -> LLMResponse | AsyncGenerator[LLMResponse, None]:
         """Generate response using Ollama API."""
-        await self.ensure_initialized()
+        if not self._initialized:
+            await self._init_locked()
         
-        # Convert messages to Ollama format
-        ollama_messages = []
-        for msg in messages:
-            ollama_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
+        options = self._chat_options
+        if "temperature" in kwargs or "max_tokens" in kwargs:
+            # Provider-specific options still take precedence
+            options = {
+                "temperature": kwargs.get("temperature", self.config.temperature),
+                "num_predict": kwargs.get("max_tokens", self.config.max_tokens),
+                **self._provider_options,
+            }
         
         # Prepare request payload
         payload = {
             "model": self.config.model,
-            "messages": ollama_messages,
+            "messages": [{"role": msg.role, "content": msg.content} for msg in messages],
             "stream": stream,
-            "options": {
-                "temperature": kwargs.get("temperature", self.config.temperature),
-                "num_predict": kwargs.get("max_tokens", self.config.max_tokens),
-            }
+            "options": options
         }
         
-        # Add provider-specific options
-        if self.config.provider_config:
-            payload["options"].update(self.config.provider_config.get("options", {}))
-        
         if stream:
             return self._stream_generate(payload)
         else:
@@ -78,7 +144,7 @@ class OllamaEngine(BaseLLMEngine):
     async def _single_generate(self, payload: Dict[str, Any]) -> LLMResponse:
         """Generate a single response."""
         try:
-            response = await self.client.post("/api/chat", json=payload)
+            response = await self.client.post("/api/chat", content=_dumps(payload), headers=_JSON_HEADERS)
             response.raise_for_status()
             
             result = response.json()
@@ -106,42 +172,91 @@ class OllamaEngine(BaseLLMEngine):
     async def _stream_generate(self, payload: Dict[str, Any]) -> AsyncGenerator[LLMResponse, None]:
         """Generate streaming responses."""
         try:
-            async with self.client.stream("POST", "/api/chat", json=payload) as response:
+            async with self.client.stream("POST", "/api/chat", content=_dumps(payload), headers=_JSON_HEADERS) as response:
                 response.raise_for_status()
                 
-                async for line in response.aiter_lines():
-                    if line.strip():
-                        try:
-                            chunk = json.loads(line)
-                            
-                            message = chunk.get("message", {})
-                            content = message.get("content", "")
-                            done = chunk.get("done", False)
-                            
-                            yield LLMResponse(
-                                content=content,
-                                usage={
-                                    "prompt_eval_count": chunk.get("prompt_eval_count", 0),
-                                    "eval_count": chunk.get("eval_count", 0),
-                                } if done else None,
-                                metadata={
-                                    "model": chunk.get("model"),
-                                    "created_at": chunk.get("created_at"),
-                                },
-                                finished=done
-                            )
-                            
-                            if done:
-                                break
-                                
-                        except json.JSONDecodeError:
-                            continue
+                async for item in self._coalesce(response, _chat_content):
+                    yield item
                             
         except httpx.HTTPStatusError as e:
             raise RuntimeError(f"Ollama streaming error: {e.response.status_code} - {e.response.text}")
         except Exception as e:
             raise RuntimeError(f"Ollama streaming failed: {e}")
     
+    async def _coalesce(
+        self,
+        response: httpx.Response,
+        content_of: Callable[[Dict[str, Any]], str]
+    ) -> AsyncGenerator[LLMResponse, None]:
+        """
+        Merge streamed chunks into fewer responses.
+        
+        A response is flushed once stream_coalesce_chunks chunks are buffered,
+        stream_coalesce_ms has passed since the first buffered chunk (even if
+        no further chunk arrives), or the stream is done. Only the final flush
+        is marked finished.
+        """
+        max_chunks = self.stream_coalesce_chunks
+        max_wait = self.stream_coalesce_ms / 1000
+        parts: List[str] = []
+        deadline = 0.0
+        chunk = _EMPTY
+        lines = _iter_json_lines(response)
+        # The read in flight; kept across a deadline flush rather than cancelled,
+        # since cancelling would abort the underlying stream
+        pending: Optional[asyncio.Future] = None
+        
+        def flush(done: bool) -> LLMResponse:
+            return LLMResponse(
+                content="".join(parts),
+                usage={
+                    "prompt_eval_count": chunk.get("prompt_eval_count", 0),
+                    "eval_count": chunk.get("eval_count", 0),
+                } if done else None,
+                metadata={
+                    "model": chunk.get("model"),
+                    "created_at": chunk.get("created_at"),
+                },
+                finished=done
+            )
+        
+        try:
+            while True:
+                if pending is None:
+                    pending = asyncio.ensure_future(anext(lines, _END))
+                if parts:
+                    finished, _ = await asyncio.wait((pending,), timeout=max(deadline - time.monotonic(), 0))
+                    if not finished:
+                        # Nothing new within the window: hand over what is buffered
+                        yield flush(False)
+                        parts = []
+                        continue
+                
+                next_chunk = await pending
+                pending = None
+                if next_chunk is _END:
+                    break
+                chunk = next_chunk
+                
+                done = chunk.get("done", False)
+                if not parts:
+                    deadline = time.monotonic() + max_wait
+                parts.append(content_of(chunk))
+                
+                if done or len(parts) >= max_chunks or time.monotonic() >= deadline:
+                    yield flush(done)
+                    parts = []
+                    
+                    if done:
+                        break
+        finally:
+            if pending is not None:
+                pending.cancel()
+        
+        # Stream ended without a done chunk: flush what is left
+        if parts:
+            yield flush(False)
+    
     async def completion(
         self,
         request: CompletionRequest,
@@ -157,7 +272,8 @@ class OllamaEngine(BaseLLMEngine):
         Returns:
             LLMResponse for non-streaming, AsyncGenerator for streaming
         """
-        await self.ensure_initialized()
+        if not self._initialized:
+            await self._init_locked()
         
         # Build completion payload for Ollama's generate API
         payload = {
@@ -178,8 +294,8 @@ class OllamaEngine(BaseLLMEngine):
             payload["options"].update(kwargs)
         
         # Add provider-specific options
-        if self.config.provider_config:
-            payload["options"].update(self.config.provider_config.get("options", {}))
+        if self._provider_options:
+            payload["options"].update(self._provider_options)
         
         if request.stream:
             return self._stream_completion(payload)
@@ -189,7 +305,7 @@ class OllamaEngine(BaseLLMEngine):
     async def _single_completion(self, payload: Dict[str, Any]) -> LLMResponse:
         """Generate a single completion response."""
         try:
-            response = await self.client.post("/api/generate", json=payload)
+            response = await self.client.post("/api/generate", content=_dumps(payload), headers=_JSON_HEADERS)
             response.raise_for_status()
             
             result = response.json()
@@ -217,35 +333,11 @@ class OllamaEngine(BaseLLMEngine):
     async def _stream_completion(self, payload: Dict[str, Any]) -> AsyncGenerator[LLMResponse, None]:
         """Generate streaming completion responses."""
         try:
-            async with self.client.stream("POST", "/api/generate", json=payload) as response:
+            async with self.client.stream("POST", "/api/generate", content=_dumps(payload), headers=_JSON_HEADERS) as response:
                 response.raise_for_status()
                 
-                async for line in response.aiter_lines():
-                    if line.strip():
-                        try:
-                            chunk = json.loads(line)
-                            
-                            content = chunk.get("response", "")
-                            done = chunk.get("done", False)
-                            
-                            yield LLMResponse(
-                                content=content,
-                                usage={
-                                    "prompt_eval_count": chunk.get("prompt_eval_count", 0),
-                                    "eval_count": chunk.get("eval_count", 0),
-                                } if done else None,
-                                metadata={
-                                    "model": chunk.get("model"),
-                                    "created_at": chunk.get("created_at"),
-                                },
-                                finished=done
-                            )
-                            
-                            if done:
-                                break
-                                
-                        except json.JSONDecodeError:
-                            continue
+                async for item in self._coalesce(response, _completion_content):
+                    yield item
                             
         except httpx.HTTPStatusError as e:
             raise RuntimeError(f"Ollama completion streaming error: {e.response.status_code} - {e.response.text}")
@@ -253,9 +345,14 @@ class OllamaEngine(BaseLLMEngine):
             raise RuntimeError(f"Ollama completion streaming failed: {e}")
 
     async def close(self):
-        """Close the HTTP client."""
-        if self.client:
-            await self.client.aclose()
+        """Close the HTTP client (a shared transport is left to its owner)."""
+        if self.client is None:
+            return
+        client, self.client = self.client, None
+        self._initialized = False
+        # aclose() would also close the transport; with a shared one, just drop the client
+        if self.transport is None:
+            await client.aclose()
 
 
 # Register the engine
@@ -11,8 +11,8 @@ from .base import BaseLLMEngine, LLMConfig, LLMMessage, LLMResponse, CompletionR
 class VLLMEngine(BaseLLMEngine):
     """vLLM LLM engine implementation using OpenAI-compatible API."""
     
-    def __init__(self, config: LLMConfig):
-        super().__init__(config)
+    def __init__(self, config: LLMConfig, transport: Optional[httpx.AsyncBaseTransport] = None):
+        super().__init__(config, transport)
         self.client = None
         self.base_url = config.endpoint.rstrip('/')
         
@@ -33,6 +33,7 @@ class VLLMEngine(BaseLLMEngine):
         self.client = httpx.AsyncClient(
             timeout=httpx.Timeout(self.config.timeout),
             base_url=self.base_url,
+            transport=self.transport,
             headers=headers
         )
         
@@ -57,7 +58,8 @@ class VLLMEngine(BaseLLMEngine):
         **kwargs
     ) -> LLMResponse | AsyncGenerator[LLMResponse, None]:
         """Generate response using vLLM OpenAI-compatible API."""
-        await self.ensure_initialized()
+        if not self._initialized:
+            await self._init_locked()
         
         # Convert messages to OpenAI format
         openai_messages = []
@@ -202,7 +204,8 @@ class VLLMEngine(BaseLLMEngine):
         Returns:
             LLMResponse for non-streaming, AsyncGenerator for streaming
         """
-        await self.ensure_initialized()
+        if not self._initialized:
+            await self._init_locked()
         
         # Build completion payload
         payload = {
@@ -316,9 +319,14 @@ class VLLMEngine(BaseLLMEngine):
             raise RuntimeError(f"vLLM completion streaming failed: {e}")
 
     async def close(self):
-        """Close the HTTP client."""
-        if self.client:
-            await self.client.aclose()
+        """Close the HTTP client (a shared transport is left to its owner)."""
+        if self.client is None:
+            return
+        client, self.client = self.client, None
+        self._initialized = False
+        # aclose() would also close the transport; with a shared one, just drop the client
+        if self.transport is None:
+            await client.aclose()
 
 
 # Register the engine
@@ -15,6 +15,11 @@ from pydantic import BaseModel, validator
 from .client import MCPServerConfig
 from .security import SecurityRule, PermissionLevel, OperationType
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
 
 class MCPConfig(BaseModel):
     """Main MCP configuration."""
@@ -55,7 +60,7 @@ class MCPConfigManager:
             self.logger.info(f"Loading MCP configuration from {self.config_path}")
             
             with open(self.config_path, 'r', encoding='utf-8') as f:
-                full_config = yaml.safe_load(f)
+                full_config = yaml.load(f, Loader=_YamlLoader)
             
             mcp_section = full_config.get('mcp', {})
             
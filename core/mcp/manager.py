@@ -14,6 +14,11 @@ from datetime import datetime, timedelta
 
 from .client import MCPClient, MCPServerConfig
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
 
 class MCPServerManager:
     """
@@ -74,7 +79,7 @@ class MCPServerManager:
                 return False
             
             with open(config_file, 'r', encoding='utf-8') as f:
-                config = yaml.safe_load(f)
+                config = yaml.load(f, Loader=_YamlLoader)
             
             mcp_config = config.get('mcp', {})
             if not mcp_config.get('enabled', False):
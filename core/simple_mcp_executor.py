@@ -9,6 +9,21 @@ import subprocess
 from typing import Dict, Any, Optional, List
 from dataclasses import dataclass
 
+try:
+    import orjson
+except ImportError:  # orjson is optional; fall back to the stdlib json module
+    orjson = None
+
+
+def _dumps(obj: Any) -> bytes:
+    """Serialize a JSON-RPC message to UTF-8 bytes."""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode()
+
+
+_loads = orjson.loads if orjson is not None else json.loads
+
 
 @dataclass 
 class SimpleMCPResult:
@@ -76,7 +91,7 @@ class SimpleMCPExecutor:
             ]
             
             # Prepare input
-            input_data = '\n'.join(json.dumps(msg) for msg in messages) + '\n'
+            input_data = b'\n'.join(_dumps(msg) for msg in messages) + b'\n'
             
             # Execute server process
             process = await asyncio.create_subprocess_exec(
@@ -87,7 +102,7 @@ class SimpleMCPExecutor:
             )
             
             # Send messages and get response
-            stdout, stderr = await process.communicate(input=input_data.encode())
+            stdout, stderr = await process.communicate(input=input_data)
             
             if process.returncode != 0:
                 return SimpleMCPResult(
@@ -98,11 +113,11 @@ class SimpleMCPExecutor:
             
             # Parse responses
             responses = []
-            for line in stdout.decode().strip().split('\n'):
+            for line in stdout.splitlines():
                 if line.strip():
                     try:
-                        responses.append(json.loads(line))
-                    except json.JSONDecodeError:
+                        responses.append(_loads(line))
+                    except json.JSONDecodeError:  # orjson.JSONDecodeError subclasses this
                         continue
             
             # Find tool call result (id=2)
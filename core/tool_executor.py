@@ -11,6 +11,11 @@ from typing import Dict, List, Optional, Any, Tuple
 from dataclasses import dataclass
 from .simple_mcp_executor import SimpleMCPExecutor, SimpleMCPResult
 
+try:
+    from yaml import CSafeLoader as _YamlLoader
+except ImportError:  # PyYAML built without libyaml
+    from yaml import SafeLoader as _YamlLoader
+
 
 @dataclass
 class ToolCall:
@@ -32,6 +37,10 @@ class ToolResult:
 class ToolExecutor:
     """Handles parsing and execution of tool calls."""
     
+    # Literal prefix every tool call starts with; checked before running the regex
+    SENTINEL = "<tool_use"
+    _sentinel_search = re.compile(re.escape(SENTINEL), re.IGNORECASE).search
+    
     def __init__(self, mcp_manager=None):
         """Initialize tool executor with MCP manager."""
         self.mcp_manager = mcp_manager
@@ -41,10 +50,22 @@ class ToolExecutor:
             re.DOTALL | re.IGNORECASE
         )
     
-    def parse_tool_calls(self, text: str) -> List[ToolCall]:
+    def find_tool_uses(self, text: str) -> List[re.Match]:
+        """Find all <tool_use> blocks in text in a single scan."""
+        if not self._may_contain_tool_use(text):
+            return []
+        return list(self.tool_use_pattern.finditer(text))
+    
+    def _may_contain_tool_use(self, text: str) -> bool:
+        """Cheap literal pre-check, case-insensitive like the tag pattern itself."""
+        return self._sentinel_search(text) is not None
+    
+    def parse_tool_calls(self, text: str, matches: Optional[List[re.Match]] = None) -> List[ToolCall]:
         """
         Parse <tool_use> tags from text and extract tool calls.
         
+        If matches from find_tool_uses() are given, the text is not scanned again.
+        
         Expected format:
         <tool_use>
         name: get_current_time
@@ -58,7 +79,10 @@ class ToolExecutor:
         """
         tool_calls = []
         
-        for match in self.tool_use_pattern.finditer(text):
+        if matches is None:
+            matches = self.tool_use_pattern.finditer(text)
+        
+        for match in matches:
             raw_content = match.group(1).strip()
             
             try:
@@ -78,7 +102,7 @@ class ToolExecutor:
                             except json.JSONDecodeError:
                                 try:
                                     # Try standard YAML (e.g., {key: value})
-                                    parameters = yaml.safe_load(param_str)
+                                    parameters = yaml.load(param_str, Loader=_YamlLoader)
                                 except yaml.YAMLError:
                                     try:
                                         # Try as space-separated key-value pairs: key1: "value1" key2: "value2"
@@ -108,7 +132,7 @@ class ToolExecutor:
                         continue
                 else:
                     # Multi-line YAML format
-                    parsed = yaml.safe_load(raw_content)
+                    parsed = yaml.load(raw_content, Loader=_YamlLoader)
                     if isinstance(parsed, dict):
                         name = parsed.get('name', '')
                         parameters = parsed.get('parameters', {})
@@ -152,14 +176,25 @@ class ToolExecutor:
                 error=str(e)
             )
     
-    async def execute_tools_in_text(self, text: str) -> Tuple[List[ToolResult], str]:
+    async def execute_tools_in_text(
+        self,
+        text: str,
+        matches: Optional[List[re.Match]] = None
+    ) -> Tuple[List[ToolResult], str]:
         """
         Execute all tools found in text and return results with cleaned text.
         
+        Args:
+            text: Text containing <tool_use> tags
+            matches: Optional result of find_tool_uses(text) to avoid rescanning
+        
         Returns:
             Tuple of (tool_results, cleaned_text)
         """
-        tool_calls = self.parse_tool_calls(text)
+        if matches is None:
+            matches = self.find_tool_uses(text)
+        
+        tool_calls = self.parse_tool_calls(text, matches)
         tool_results = []
         
         # Execute all tool calls
@@ -168,7 +203,13 @@ class ToolExecutor:
             tool_results.append(result)
         
         # Remove tool_use tags from text
-        cleaned_text = self.tool_use_pattern.sub('', text).strip()
+        parts = []
+        cursor = 0
+        for match in matches:
+            parts.append(text[cursor:match.start()])
+            cursor = match.end()
+        parts.append(text[cursor:])
+        cleaned_text = ''.join(parts).strip()
         
         return tool_results, cleaned_text
     
@@ -182,7 +223,7 @@ class ToolExecutor:
     
     def has_tool_calls(self, text: str) -> bool:
         """Check if text contains tool_use tags."""
-        return bool(self.tool_use_pattern.search(text))
+        return self._may_contain_tool_use(text) and bool(self.tool_use_pattern.search(text))
 
 
 # Test function for development
@@ -0,0 +1,62 @@
+"""
+Tests for the interactive CLI.
+"""
+
+import pytest
+import io
+from pathlib import Path
+import sys
+
+from rich.console import Console
+
+# Add parent directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from cli.app import DesktopAgentCLI
+from core.code_executor import CodeExecutor
+from core.llm.base import LLMMessage, LLMResponse
+
+
+@pytest.mark.asyncio
+class TestStreamingCodeExecution:
+    """Test code blocks executed while a response streams."""
+    
+    async def _stream(self, chunks):
+        cli = DesktopAgentCLI()
+        cli.console = Console(file=io.StringIO())
+        cli.code_executor = CodeExecutor({"workers": 1, "timeout": 10})
+        
+        async def generate_stream(messages):
+            for i, content in enumerate(chunks):
+                yield LLMResponse(content=content, finished=i == len(chunks) - 1)
+        
+        async def no_continuation(messages, content):
+            return None
+        
+        cli.llm_manager.generate_stream = generate_stream
+        cli._handle_code_continuation = no_continuation
+        try:
+            await cli._handle_streaming_response([LLMMessage(role="user", content="run")])
+        finally:
+            await cli.code_executor.close()
+        return cli.conversation_history[-1].content
+    
+    async def test_chunk_closing_one_block_and_opening_the_next(self):
+        """Test that a block opened in the chunk that closes the previous one still runs."""
+        content = await self._stream([
+            "<code>\nprint(1)",
+            "\n</code>\n<code>\nprint(2)",
+            "\n</code>\ndone",
+        ])
+        assert content.count("<code_output>") == 2
+        assert "1" in content.split("<code_output>")[1]
+        assert "2" in content.split("<code_output>")[2]
+    
+    async def test_tags_split_across_chunks(self):
+        """Test that opening and closing tags split over chunks are still found."""
+        content = await self._stream(["<code>print(1)</code> <co", "de>print(2)</co", "de> end"])
+        assert content.count("<code_output>") == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])
@@ -0,0 +1,99 @@
+"""
+Tests for the pooled code executor.
+"""
+
+import pytest
+import pytest_asyncio
+import time
+from pathlib import Path
+import sys
+
+# Add parent directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.code_executor import CodeExecutor
+
+
+@pytest_asyncio.fixture
+async def executor():
+    """Code executor with a single warm worker, so every snippet reuses it."""
+    code_executor = CodeExecutor({"workers": 1, "timeout": 10})
+    yield code_executor
+    await code_executor.close()
+
+
+@pytest.mark.asyncio
+class TestWorkerIsolation:
+    """Snippets sharing a warm worker must not see each other's state."""
+
+    async def test_cwd_and_environment_do_not_leak(self, executor, tmp_path):
+        """Test that chdir and environment changes stay in their snippet."""
+        first = await executor.execute_python_code(
+            f"import os\nos.chdir({str(tmp_path)!r})\nos.environ['DESKTOP_AGENT_LEAK'] = '1'\nprint(os.getcwd())"
+        )
+        assert first.success
+        assert first.output.strip() == str(tmp_path)
+
+        second = await executor.execute_python_code(
+            "import os\nprint(os.getcwd())\nprint(os.environ.get('DESKTOP_AGENT_LEAK'))"
+        )
+        assert second.success
+        assert second.output.split() == [str(Path.cwd()), "None"]
+
+    async def test_monkeypatching_does_not_break_the_worker(self, executor):
+        """Test that patching json in a snippet affects neither the protocol nor later snippets."""
+        patched = await executor.execute_python_code("import json\njson.dumps = lambda *a, **k: 'broken'\nprint('patched')")
+        assert patched.success
+        assert patched.output.strip() == "patched"
+
+        result = await executor.execute_python_code("import json\nprint(json.dumps([1, 2]))")
+        assert result.success
+        assert result.output.strip() == "[1, 2]"
+
+    async def test_background_process_does_not_stall_output(self, executor):
+        """Test that a background child keeping stdout open doesn't delay or drop output."""
+        start = time.perf_counter()
+        result = await executor.execute_python_code(
+            "import subprocess\nsubprocess.Popen(['sleep', '3'])\nprint('bg')"
+        )
+        assert result.success
+        assert result.output.strip() == "bg"
+        assert time.perf_counter() - start < 1.0
+
+    async def test_output_before_os_exit_is_kept(self, executor):
+        """Test that output flushed before os._exit() is returned with its exit code."""
+        result = await executor.execute_python_code("import os\nprint('done', flush=True)\nos._exit(0)")
+        assert result.success
+        assert result.output.strip() == "done"
+
+        failed = await executor.execute_python_code("import os, sys\nsys.stderr.write('bad\\n')\nos._exit(3)")
+        assert not failed.success
+        assert failed.output.strip() == "bad"
+        assert failed.error == "Process exited with code 3"
+
+        # The worker survives and keeps serving
+        after = await executor.execute_python_code("print('after')")
+        assert after.output.strip() == "after"
+
+    async def test_project_packages_do_not_shadow_installed_ones(self, executor):
+        """Test that snippet imports don't resolve to packages under core/."""
+        result = await executor.execute_python_code(
+            "import sys, mcp\nprint(sys.modules['mcp'].__file__)\nprint(__file__.endswith('.py'))"
+        )
+        assert result.success, result.output
+        mcp_file, has_file = result.output.split()
+        assert not Path(mcp_file).is_relative_to(Path(__file__).parent.parent / "core")
+        assert has_file == "True"
+    
+    async def test_timeout_recovers(self):
+        """Test that a snippet running past the timeout is killed and reported."""
+        code_executor = CodeExecutor({"workers": 1, "timeout": 1})
+        try:
+            result = await code_executor.execute_python_code("import time\ntime.sleep(30)")
+            assert not result.success
+            assert result.error == "Execution timeout (1 seconds)"
+
+            after = await code_executor.execute_python_code("print('ok')")
+            assert after.output.strip() == "ok"
+        finally:
+            await code_executor.close()
@@ -0,0 +1,280 @@
+"""
+Tests for LLM engines and prompt formatting.
+"""
+
+import pytest
+import asyncio
+import json
+import time
+from pathlib import Path
+import sys
+
+import httpx
+
+# Add parent directories to path
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from core.llm.base import LLMConfig, LLMMessage
+from core.llm.chat_template import ChatTemplateManager, _split_placeholder
+from core.llm.manager import LLMManager
+from core.llm.ollama_engine import OllamaEngine
+from core.llm.vllm_engine import VLLMEngine
+
+
+def _ollama_transport(body):
+    """Mock Ollama server answering /api/chat with the given async body."""
+    def handler(request):
+        if request.url.path == "/api/tags":
+            return httpx.Response(200, json={"models": []})
+        return httpx.Response(200, content=body())
+    return httpx.MockTransport(handler)
+
+
+def _write_template(directory, name, compatible_models, user_format="<u>{content}</u>"):
+    """Write a minimal chat template file."""
+    patterns = "".join(f"\n  - {json.dumps(pattern)}" for pattern in compatible_models)
+    (directory / f"{name}.yaml").write_text(
+        f"name: {json.dumps(name)}\n"
+        f"description: test\n"
+        f"format:\n"
+        f"  system: \"<s>{{content}}</s>\"\n"
+        f"  user: {json.dumps(user_format)}\n"
+        f"  assistant: \"<a>{{content}}</a>\"\n"
+        f"  generation_prompt: \"<a>\"\n"
+        f"stop_tokens: [\"</a>\"]\n"
+        f"defaults:\n"
+        f"  add_generation_prompt: true\n"
+        f"compatible_models:{patterns or ' []'}\n",
+        encoding="utf-8"
+    )
+
+
+def _line(content, done=False, **extra):
+    return (json.dumps({"message": {"content": content}, "done": done, **extra}) + "\n").encode()
+
+
+@pytest.mark.asyncio
+class TestOllamaStreaming:
+    """Test streamed Ollama responses."""
+    
+    async def _stream(self, body, **ollama_config):
+        config = LLMConfig(
+            provider="ollama",
+            model="test",
+            endpoint="http://ollama.test",
+            provider_config={"ollama": ollama_config}
+        )
+        engine = OllamaEngine(config, transport=_ollama_transport(body))
+        received = []
+        start = time.monotonic()
+        try:
+            async for response in await engine.generate([LLMMessage(role="user", content="hi")], stream=True):
+                received.append((time.monotonic() - start, response))
+        finally:
+            await engine.close()
+        return received
+    
+    async def test_chunks_are_coalesced(self):
+        """Test that a burst of chunks arrives as one finished response."""
+        async def body():
+            yield b"".join(_line(token) for token in ["Hel", "lo", " wor"])
+            yield _line("ld", done=True, eval_count=4)
+        
+        received = await self._stream(body)
+        assert [response.content for _, response in received] == ["Hello world"]
+        assert received[-1][1].finished
+        assert received[-1][1].usage["eval_count"] == 4
+    
+    async def test_buffered_chunk_is_flushed_during_a_pause(self):
+        """Test that buffered text is not held back until the model resumes."""
+        async def body():
+            yield _line("a")
+            await asyncio.sleep(0.5)
+            yield _line("b", done=True)
+        
+        received = await self._stream(body, stream_coalesce_ms=20)
+        assert [response.content for _, response in received] == ["a", "b"]
+        assert received[0][0] < 0.3
+        assert not received[0][1].finished
+        assert received[1][1].finished
+    
+    async def test_lines_split_across_reads(self):
+        """Test that JSON lines split over network reads, or malformed, are handled."""
+        async def body():
+            data = _line("x") + b"not json\n" + _line("y", done=True)
+            for i in range(0, len(data), 7):
+                yield data[i:i + 7]
+        
+        received = await self._stream(body, stream_coalesce_chunks=1)
+        assert [response.content for _, response in received] == ["x", "y"]
+
+
+@pytest.mark.asyncio
+class TestEngineClose:
+    """Test closing engines that share a transport."""
+    
+    @pytest.mark.parametrize("engine_class, provider", [(OllamaEngine, "ollama"), (VLLMEngine, "vllm")])
+    async def test_closed_engine_reinitializes(self, engine_class, provider):
+        """Test that a closed engine builds a new client and leaves the shared transport open."""
+        def handler(request):
+            if request.url.path.endswith("/chat/completions"):
+                return httpx.Response(200, json={"choices": [{"message": {"content": "ok"}}]})
+            if request.url.path == "/api/chat":
+                return httpx.Response(200, json={"message": {"content": "ok"}, "done": True})
+            return httpx.Response(200, json={"models": [], "data": []})
+        transport = httpx.MockTransport(handler)
+        config = LLMConfig(provider=provider, model="test", endpoint="http://engine.test")
+        engine = engine_class(config, transport=transport)
+        
+        assert (await engine.generate([LLMMessage(role="user", content="hi")])).content == "ok"
+        await engine.close()
+        assert engine.client is None
+        
+        assert (await engine.generate([LLMMessage(role="user", content="hi")])).content == "ok"
+        await engine.close()
+
+
+class TestChatTemplateDetection:
+    """Test model-name based template detection."""
+    
+    def test_detection_follows_template_order(self, tmp_path):
+        """Test that the first template (by file order) with a matching pattern wins."""
+        _write_template(tmp_path, "a_first", ["qwen"])
+        _write_template(tmp_path, "b_second", ["qwen.*instruct", "mistral"])
+        manager = ChatTemplateManager(str(tmp_path))
+        
+        assert manager.auto_detect_template("Qwen3-30B-Instruct") == "a_first"
+        assert manager.auto_detect_template("mistral-7b") == "b_second"
+        assert manager.auto_detect_template("unknown-model") == "a_first"  # First template fallback
+    
+    def test_inline_flags_and_backreferences(self, tmp_path):
+        """Test patterns that can't be joined into one alternation still load and match."""
+        _write_template(tmp_path, "a_flags", ["(?i)llama.*"])
+        _write_template(tmp_path, "b_backref", [r"(ab)\1-model"])
+        manager = ChatTemplateManager(str(tmp_path))
+        
+        assert manager.list_templates() == ["a_flags", "b_backref"]
+        assert manager.auto_detect_template("LLAMA-3-8b") == "a_flags"
+        assert manager.auto_detect_template("abab-model") == "b_backref"
+        assert not manager.get_template("b_backref").matches_model("ab-model")
+
+
+class TestChatTemplateFormatting:
+    """Test prompt formatting fast paths against plain str.format."""
+    
+    @pytest.mark.parametrize("template, expected", [
+        ("<u>{content}</u>", ("<u>", "</u>")),
+        ("{content}", ("", "")),
+        ("{{x}} {content} }}", ("{x} ", " }")),
+    ])
+    def test_split_placeholder(self, template, expected):
+        """Test that the fragments reproduce str.format, with escaped braces resolved."""
+        assert _split_placeholder(template, "content") == expected
+        prefix, suffix = expected
+        assert prefix + "{v}" + suffix == template.format(content="{v}")
+    
+    @pytest.mark.parametrize("template", [
+        "{content} {other}",
+        "{other}",
+        "{content}{content}",
+        "{content!r}",
+        "{content:>5}",
+        "no field",
+        "{content",
+    ])
+    def test_split_placeholder_rejects(self, template):
+        """Test that anything but a single plain {content} field falls back to str.format."""
+        assert _split_placeholder(template, "content") is None
+    
+    def test_incremental_formatting_matches_direct(self, tmp_path):
+        """Test that reusing the previous prompt gives the same text as formatting from scratch."""
+        _write_template(tmp_path, "chat", [])
+        _write_template(tmp_path, "other", [], user_format="[{content!s}]")
+        manager = LLMManager(templates_dir=str(tmp_path))
+        template_manager = manager.chat_template_manager
+        manager.current_template = "chat"
+        
+        def check(messages, add_generation_prompt=None):
+            expected = template_manager.format_messages(messages, manager.current_template, add_generation_prompt)
+            assert manager.format_chat_messages(messages, add_generation_prompt) == expected
+        
+        history = [LLMMessage(role="system", content="sys {x}")]
+        for i in range(3):
+            history.append(LLMMessage(role="user", content=f"q{i}"))
+            check(history)
+            history.append(LLMMessage(role="assistant", content=f"a{i}"))
+            check(history, False)
+        
+        # Diverging, shorter and trimmed histories
+        check(history[:2] + [LLMMessage(role="user", content="edited")] + history[3:])
+        check(history[:3])
+        check(history[2:])
+        
+        # A template switch must not reuse text rendered with the previous one
+        manager.current_template = "other"
+        check(history)
+        assert "[q0]" in manager.format_chat_messages(history)
+
+
+class TestChatTemplateCache:
+    """Test the parsed-template JSON cache."""
+    
+    def _load(self, directory):
+        manager = ChatTemplateManager(str(directory))
+        manager.load_templates()
+        return manager
+    
+    def test_cache_is_reused(self, tmp_path, monkeypatch):
+        """Test that a second load reads the cache instead of the YAML files."""
+        _write_template(tmp_path, "cached", ["cached"])
+        first = self._load(tmp_path)
+        assert (tmp_path / ".cache.json").exists()
+        
+        def fail(*args):
+            raise AssertionError("template file parsed despite a valid cache")
+        monkeypatch.setattr(ChatTemplateManager, "_load_template_file", fail)
+        
+        second = self._load(tmp_path)
+        assert second.get_template("cached") == first.get_template("cached")
+        assert second.auto_detect_template("cached-model") == "cached"
+    
+    def test_changed_file_invalidates_cache(self, tmp_path):
+        """Test that editing a template file is picked up despite the cache."""
+        _write_template(tmp_path, "edited", [])
+        self._load(tmp_path)
+        
+        _write_template(tmp_path, "edited", [], user_format="<user>{content}</user>")
+        manager = self._load(tmp_path)
+        assert manager.format_messages([LLMMessage(role="user", content="x")], "edited", False) == "<user>x</user>"
+    
+    def test_mismatched_cache_falls_back_to_yaml(self, tmp_path):
+        """Test that cache data from another build is treated as a miss and rewritten."""
+        _write_template(tmp_path, "recovered", [])
+        self._load(tmp_path)
+        
+        cache_path = tmp_path / ".cache.json"
+        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        cache["templates"][0]["unknown_field"] = True
+        cache_path.write_text(json.dumps(cache), encoding="utf-8")
+        
+        manager = self._load(tmp_path)
+        assert manager.list_templates() == ["recovered"]
+        assert "unknown_field" not in cache_path.read_text(encoding="utf-8")
+    
+    def test_cache_from_other_version_is_ignored(self, tmp_path):
+        """Test that a cache written with another schema version is not used."""
+        _write_template(tmp_path, "versioned", [])
+        self._load(tmp_path)
+        
+        cache_path = tmp_path / ".cache.json"
+        cache = json.loads(cache_path.read_text(encoding="utf-8"))
+        cache["key"]["version"] = -1
+        cache["templates"][0]["description"] = "stale"
+        cache_path.write_text(json.dumps(cache), encoding="utf-8")
+        
+        manager = self._load(tmp_path)
+        assert manager.get_template("versioned").description == "test"
+
+
+if __name__ == "__main__":
+    pytest.main([__file__])